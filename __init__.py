@@ -1 +1,3 @@
-from .ipythonmagic import load_ipython_extension
+def load_ipython_extension(ip):
+    from .ipythonmagic import load_ipython_extension
+    load_ipython_extension(ip)
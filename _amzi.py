@@ -3,9 +3,9 @@ import _cffi_backend
 
 ffi = _cffi_backend.FFI('_amzi',
     _version = 0x2601,
-    _types = b'\x00\x00\x0E\x0D\x00\x00\x05\x03\x00\x00\x79\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x78\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x76\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x00\x0B\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x07\x01\x00\x00\x01\x0B\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x0E\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x07\x01\x00\x00\x13\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x09\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x02\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x02\x11\x00\x00\x06\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x13\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x07\x01\x00\x00\x13\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x39\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x06\x01\x00\x00\x04\x03\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x77\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x77\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x05\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x78\x0D\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x00\x09\x00\x00\x02\x0B\x00\x00\x00\x01\x00\x00\x10\x01',
-    _globals = (b'\xFF\xFF\xFF\x0BCUR_ERR',2,b'\xFF\xFF\xFF\x0BCUR_IN',0,b'\xFF\xFF\xFF\x0BCUR_OUT',1,b'\xFF\xFF\xFF\x0BUSER_ERR',5,b'\xFF\xFF\xFF\x0BUSER_IN',3,b'\xFF\xFF\xFF\x0BUSER_OUT',4,b'\xFF\xFF\xFF\x0BcAATOM',0,b'\xFF\xFF\xFF\x0BcADDR',7,b'\xFF\xFF\xFF\x0BcASTR',1,b'\xFF\xFF\xFF\x0BcDOUBLE',6,b'\xFF\xFF\xFF\x0BcFLOAT',5,b'\xFF\xFF\xFF\x0BcGOAL',12,b'\xFF\xFF\xFF\x0BcINT',2,b'\xFF\xFF\xFF\x0BcLONG',3,b'\xFF\xFF\xFF\x0BcMOD',11,b'\xFF\xFF\xFF\x0BcSHORT',4,b'\xFF\xFF\xFF\x0BcTERM',8,b'\xFF\xFF\xFF\x0BcWATOM',10,b'\xFF\xFF\xFF\x0BcWSTR',9,b'\x00\x00\x5D\x23lsAddPredW',0,b'\x00\x00\x59\x23lsAssertaStrW',0,b'\x00\x00\x59\x23lsAssertzStrW',0,b'\x00\x00\x30\x23lsCallStrW',0,b'\x00\x00\x04\x23lsClearCall',0,b'\x00\x00\x04\x23lsClose',0,b'\x00\x00\x30\x23lsExecStrW',0,b'\x00\x00\x41\x23lsGetArg',0,b'\x00\x00\x68\x23lsGetArgType',0,b'\x00\x00\x71\x23lsGetExceptMsgW',0,b'\x00\x00\x53\x23lsGetFAW',0,b'\x00\x00\x3B\x23lsGetHead',0,b'\x00\x00\x10\x23lsGetParm',0,b'\x00\x00\x6D\x23lsGetTail',0,b'\x00\x00\x3B\x23lsGetTerm',0,b'\x00\x00\x64\x23lsGetTermType',0,b'\x00\x00\x07\x23lsInitPredsW',0,b'\x00\x00\x00\x23lsInitW',0,b'\x00\x00\x59\x23lsLoadW',0,b'\x00\x00\x04\x23lsMain',0,b'\x00\x00\x30\x23lsMakeAtomW',0,b'\x00\x00\x35\x23lsMakeFAW',0,b'\x00\x00\x1A\x23lsMakeFloat',0,b'\x00\x00\x26\x23lsMakeInt',0,b'\x00\x00\x16\x23lsMakeList',0,b'\x00\x00\x30\x23lsMakeStrW',0,b'\x00\x00\x2B\x23lsPushList',0,b'\x00\x00\x04\x23lsRedo',0,b'\x00\x00\x48\x23lsSetInput',0,b'\x00\x00\x48\x23lsSetOutputW',0,b'\x00\x00\x0B\x23lsSetStream',0,b'\x00\x00\x30\x23lsStrToTermW',0,b'\x00\x00\x4D\x23lsTermToStrQW',0,b'\x00\x00\x4D\x23lsTermToStrW',0,b'\x00\x00\x48\x23lsUnify',0,b'\x00\x00\x1F\x23lsUnifyArg',0,b'\x00\x00\x10\x23lsUnifyParm',0,b'\xFF\xFF\xFF\x0BpADDR',7,b'\xFF\xFF\xFF\x0BpATOM',0,b'\xFF\xFF\xFF\x0BpERR',-1,b'\xFF\xFF\xFF\x0BpFLOAT',3,b'\xFF\xFF\xFF\x0BpINT',1,b'\xFF\xFF\xFF\x0BpLIST',5,b'\xFF\xFF\xFF\x0BpREAL',11,b'\xFF\xFF\xFF\x0BpSTR',2,b'\xFF\xFF\xFF\x0BpSTRUCT',4,b'\xFF\xFF\xFF\x0BpTERM',6,b'\xFF\xFF\xFF\x0BpVAR',8,b'\xFF\xFF\xFF\x0BpWATOM',10,b'\xFF\xFF\xFF\x0BpWSTR',9),
-    _struct_unions = ((b'\x00\x00\x00\x76\x00\x00\x00\x02$PRED_INITW',b'\x00\x00\x02\x11Pname',b'\x00\x00\x39\x11Parity',b'\x00\x00\x61\x11Pfunc'),),
-    _enums = (b'\x00\x00\x00\x0D\x00\x00\x00\x16$STREAM\x00CUR_IN,CUR_OUT,CUR_ERR,USER_IN,USER_OUT,USER_ERR',b'\x00\x00\x00\x13\x00\x00\x00\x16$cTYPE\x00cAATOM,cASTR,cINT,cLONG,cSHORT,cFLOAT,cDOUBLE,cADDR,cTERM,cWSTR,cWATOM,cMOD,cGOAL',b'\x00\x00\x00\x77\x00\x00\x00\x15$pTYPE\x00pERR,pATOM,pINT,pSTR,pFLOAT,pSTRUCT,pLIST,pTERM,pADDR,pVAR,pWSTR,pWATOM,pREAL'),
-    _typenames = (b'\x00\x00\x00\x39ARITY',b'\x00\x00\x00\x57ARITYptr',b'\x00\x00\x00\x05ENGid',b'\x00\x00\x00\x01ENGidptr',b'\x00\x00\x00\x61ExtPred',b'\x00\x00\x00\x76PRED_INITW',b'\x00\x00\x00\x09PRED_INITWptr',b'\x00\x00\x00\x0DSTREAM',b'\x00\x00\x00\x05TERM',b'\x00\x00\x00\x01TERMptr',b'\x00\x00\x00\x05VOIDptr',b'\x00\x00\x00\x13cTYPE',b'\x00\x00\x00\x77pTYPE',b'\x00\x00\x00\x39uintCH'),
+    _types = b'\x00\x00\x0E\x0D\x00\x00\x05\x03\x00\x00\x7D\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x7C\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x7A\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x00\x0B\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x07\x01\x00\x00\x01\x0B\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x0E\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x07\x01\x00\x00\x13\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x09\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x02\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x01\x11\x00\x00\x02\x11\x00\x00\x06\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x13\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x07\x01\x00\x00\x13\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x39\x03\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x00\x0F\x00\x00\x0E\x0D\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x06\x01\x00\x00\x04\x03\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x7B\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x7B\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x05\x0D\x00\x00\x05\x11\x00\x00\x05\x11\x00\x00\x00\x0F\x00\x00\x7C\x0D\x00\x00\x05\x11\x00\x00\x02\x11\x00\x00\x07\x01\x00\x00\x00\x0F\x00\x00\x00\x09\x00\x00\x02\x0B\x00\x00\x00\x01\x00\x00\x10\x01',
+    _globals = (b'\xFF\xFF\xFF\x0BCUR_ERR',2,b'\xFF\xFF\xFF\x0BCUR_IN',0,b'\xFF\xFF\xFF\x0BCUR_OUT',1,b'\xFF\xFF\xFF\x0BUSER_ERR',5,b'\xFF\xFF\xFF\x0BUSER_IN',3,b'\xFF\xFF\xFF\x0BUSER_OUT',4,b'\xFF\xFF\xFF\x0BcAATOM',0,b'\xFF\xFF\xFF\x0BcADDR',7,b'\xFF\xFF\xFF\x0BcASTR',1,b'\xFF\xFF\xFF\x0BcDOUBLE',6,b'\xFF\xFF\xFF\x0BcFLOAT',5,b'\xFF\xFF\xFF\x0BcGOAL',12,b'\xFF\xFF\xFF\x0BcINT',2,b'\xFF\xFF\xFF\x0BcLONG',3,b'\xFF\xFF\xFF\x0BcMOD',11,b'\xFF\xFF\xFF\x0BcSHORT',4,b'\xFF\xFF\xFF\x0BcTERM',8,b'\xFF\xFF\xFF\x0BcWATOM',10,b'\xFF\xFF\xFF\x0BcWSTR',9,b'\x00\x00\x61\x23lsAddPredW',0,b'\x00\x00\x3B\x23lsAsserta',0,b'\x00\x00\x5D\x23lsAssertaStrW',0,b'\x00\x00\x3B\x23lsAssertz',0,b'\x00\x00\x5D\x23lsAssertzStrW',0,b'\x00\x00\x16\x23lsCall',0,b'\x00\x00\x30\x23lsCallStrW',0,b'\x00\x00\x04\x23lsClearCall',0,b'\x00\x00\x04\x23lsClose',0,b'\x00\x00\x16\x23lsExec',0,b'\x00\x00\x30\x23lsExecStrW',0,b'\x00\x00\x45\x23lsGetArg',0,b'\x00\x00\x6C\x23lsGetArgType',0,b'\x00\x00\x75\x23lsGetExceptMsgW',0,b'\x00\x00\x57\x23lsGetFAW',0,b'\x00\x00\x3F\x23lsGetHead',0,b'\x00\x00\x10\x23lsGetParm',0,b'\x00\x00\x71\x23lsGetTail',0,b'\x00\x00\x3F\x23lsGetTerm',0,b'\x00\x00\x68\x23lsGetTermType',0,b'\x00\x00\x07\x23lsInitPredsW',0,b'\x00\x00\x00\x23lsInitW',0,b'\x00\x00\x5D\x23lsLoadW',0,b'\x00\x00\x04\x23lsMain',0,b'\x00\x00\x30\x23lsMakeAtomW',0,b'\x00\x00\x35\x23lsMakeFAW',0,b'\x00\x00\x1A\x23lsMakeFloat',0,b'\x00\x00\x26\x23lsMakeInt',0,b'\x00\x00\x16\x23lsMakeList',0,b'\x00\x00\x30\x23lsMakeStrW',0,b'\x00\x00\x2B\x23lsPushList',0,b'\x00\x00\x04\x23lsRedo',0,b'\x00\x00\x3B\x23lsRetract',0,b'\x00\x00\x4C\x23lsSetInput',0,b'\x00\x00\x4C\x23lsSetOutputW',0,b'\x00\x00\x0B\x23lsSetStream',0,b'\x00\x00\x30\x23lsStrToTermW',0,b'\x00\x00\x51\x23lsTermToStrQW',0,b'\x00\x00\x51\x23lsTermToStrW',0,b'\x00\x00\x4C\x23lsUnify',0,b'\x00\x00\x1F\x23lsUnifyArg',0,b'\x00\x00\x10\x23lsUnifyParm',0,b'\xFF\xFF\xFF\x0BpADDR',7,b'\xFF\xFF\xFF\x0BpATOM',0,b'\xFF\xFF\xFF\x0BpERR',-1,b'\xFF\xFF\xFF\x0BpFLOAT',3,b'\xFF\xFF\xFF\x0BpINT',1,b'\xFF\xFF\xFF\x0BpLIST',5,b'\xFF\xFF\xFF\x0BpREAL',11,b'\xFF\xFF\xFF\x0BpSTR',2,b'\xFF\xFF\xFF\x0BpSTRUCT',4,b'\xFF\xFF\xFF\x0BpTERM',6,b'\xFF\xFF\xFF\x0BpVAR',8,b'\xFF\xFF\xFF\x0BpWATOM',10,b'\xFF\xFF\xFF\x0BpWSTR',9),
+    _struct_unions = ((b'\x00\x00\x00\x7A\x00\x00\x00\x02$PRED_INITW',b'\x00\x00\x02\x11Pname',b'\x00\x00\x39\x11Parity',b'\x00\x00\x65\x11Pfunc'),),
+    _enums = (b'\x00\x00\x00\x0D\x00\x00\x00\x16$STREAM\x00CUR_IN,CUR_OUT,CUR_ERR,USER_IN,USER_OUT,USER_ERR',b'\x00\x00\x00\x13\x00\x00\x00\x16$cTYPE\x00cAATOM,cASTR,cINT,cLONG,cSHORT,cFLOAT,cDOUBLE,cADDR,cTERM,cWSTR,cWATOM,cMOD,cGOAL',b'\x00\x00\x00\x7B\x00\x00\x00\x15$pTYPE\x00pERR,pATOM,pINT,pSTR,pFLOAT,pSTRUCT,pLIST,pTERM,pADDR,pVAR,pWSTR,pWATOM,pREAL'),
+    _typenames = (b'\x00\x00\x00\x39ARITY',b'\x00\x00\x00\x5BARITYptr',b'\x00\x00\x00\x05ENGid',b'\x00\x00\x00\x01ENGidptr',b'\x00\x00\x00\x65ExtPred',b'\x00\x00\x00\x7APRED_INITW',b'\x00\x00\x00\x09PRED_INITWptr',b'\x00\x00\x00\x0DSTREAM',b'\x00\x00\x00\x05TERM',b'\x00\x00\x00\x01TERMptr',b'\x00\x00\x00\x05VOIDptr',b'\x00\x00\x00\x13cTYPE',b'\x00\x00\x00\x7BpTYPE',b'\x00\x00\x00\x39uintCH'),
 )
@@ -0,0 +1,69 @@
+import threading
+
+ffi = lib = None
+_loaded = False
+_load_lock = threading.Lock()
+_local = threading.local()
+
+
+def _load():
+    global ffi, lib, _loaded
+    if _loaded:
+        return lib
+    with _load_lock:
+        if not _loaded:
+            _loaded = True
+            try:
+                from ._amzi_accel import ffi, lib
+            except ImportError:
+                return None
+            ffi.def_extern(name="pyamzi_output_flush")(_output_flush)
+    return lib
+
+
+def available():
+    return _load() is not None
+
+
+def _output_flush(text, size):
+    output = getattr(_local, "output", None)
+    if output is not None and not output.mute:
+        output._write(ffi.unpack(text, size))
+
+
+def output_callbacks():
+    return ffi.addressof(lib, "pyamzi_putc"), ffi.addressof(lib, "pyamzi_puts")
+
+
+def set_output(output):
+    if getattr(_local, "output", None) is not output:
+        lib.pyamzi_output_drain()
+        _local.output = output
+
+
+def drain_output(output):
+    set_output(output)
+    lib.pyamzi_output_drain()
+
+
+def list_items(eng_id, term_id):
+    size = lib.pyamzi_list_length(eng_id, term_id)
+    items = ffi.new("pyamzi_item[]", size)
+    if lib.pyamzi_list_items(eng_id, term_id, items, size) != size:
+        return None
+    return items
+
+
+def struct_items(eng_id, term_id, arity):
+    items = ffi.new("pyamzi_item[]", arity)
+    if lib.pyamzi_struct_items(eng_id, term_id, arity, items) != arity:
+        return None
+    return items
+
+
+def make_number_list(eng_id, list_term, values, kind):
+    if kind is int:
+        res = lib.pyamzi_make_int_list(eng_id, list_term, ffi.new("long[]", values), len(values))
+    else:
+        res = lib.pyamzi_make_float_list(eng_id, list_term, ffi.new("double[]", values), len(values))
+    return res == 0
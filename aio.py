@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from .pyamzi import Engine
+
+
+class AsyncEngine:
+    def __init__(self, name=None, load_init=True, factory=None, queue_size=64):
+        if name is None:
+            name = str(uuid.uuid1())
+        if factory is None:
+            factory = lambda: Engine(name, load_init=load_init)
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="amzi-{}".format(name))
+        self.engine = None
+        self._started = self._executor.submit(self._start, factory)
+
+    @classmethod
+    async def create(cls, *args, **kw):
+        eng = cls(*args, **kw)
+        await eng.start()
+        return eng
+
+    def _start(self, factory):
+        eng = factory()
+        eng.owner = threading.get_ident()
+        self.engine = eng
+        return eng
+
+    async def start(self):
+        try:
+            return await asyncio.wrap_future(self._started)
+        except Exception:
+            self._executor.shutdown(wait=False)
+            raise
+
+    async def _submit(self, func):
+        await self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func)
+
+    async def run(self, func, *args, **kw):
+        return await self._submit(lambda: func(self.engine, *args, **kw))
+
+    async def query_one(self, query, **kw):
+        return await self.run(Engine.query_one, query, **kw)
+
+    async def find_all(self, term_str, **kw):
+        return await self.run(Engine.find_all, term_str, **kw)
+
+    async def exec_str(self, term_str):
+        return await self.run(Engine.exec_str, term_str)
+
+    async def consult_str(self, program):
+        return await self.run(Engine.consult_str, program)
+
+    async def reconsult_str(self, program):
+        return await self.run(Engine.reconsult_str, program)
+
+    async def query_all(self, query, **kw):
+        async for item in self._stream(Engine.query_all, query, **kw):
+            yield item
+
+    async def _stream(self, func, *args, **kw):
+        items = await self.run(func, *args, **kw)
+        try:
+            while True:
+                batch = await self._submit(lambda: list(islice(items, self.queue_size)))
+                for item in batch:
+                    yield item
+                if len(batch) < self.queue_size:
+                    break
+        finally:
+            await self._submit(items.close)
+
+    async def close(self):
+        try:
+            await self.run(Engine.close)
+        finally:
+            self._executor.shutdown()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,280 @@
+import os
+import sys
+import time
+import uuid
+from ._amzi import ffi
+from .pyamzi import Engine, Struct
+
+
+NAT_PROGRAM = """
+nat(Max, X):- nat(0, Max, X).
+nat(I, Max, I):- I < Max.
+nat(I, Max, X):- I < Max, I1 is I + 1, nat(I1, Max, X).
+"""
+
+
+def make_engine(program=None):
+    eng = Engine(str(uuid.uuid1()), load_init=True)
+    if program is not None:
+        eng.reconsult_str(program)
+    return eng
+
+
+def timeit(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name, size, seconds):
+    print("{:<32} {:>10} {:>12.4f}s {:>14.0f}/s".format(name, size, seconds, size / seconds))
+
+
+def bench_find_all(sizes=(1000, 100000, 1000000), chunk_size=10000):
+    eng = make_engine(NAT_PROGRAM)
+    try:
+        for size in sizes:
+            goal = "nat({}, X)".format(size)
+            repeat = 3 if size < 1000000 else 1
+            report("find_all redo", size, timeit(lambda: eng.find_all(goal), repeat))
+            report("find_all bulk", size, timeit(lambda: eng.find_all(goal, bulk=True), repeat))
+            report("find_all chunk={}".format(chunk_size), size,
+                   timeit(lambda: eng.find_all(goal, chunk_size=chunk_size), repeat))
+    finally:
+        eng.close()
+
+
+def term_to_object_per_node(term):
+    if term.is_list:
+        if term.head is None:
+            return []
+        list_res = []
+        while True:
+            list_res.append(term_to_object_per_node(term.head))
+            term = term.tail
+            if term is None:
+                break
+        return list_res
+    elif term.is_struct:
+        return Struct(term.functor, tuple(term_to_object_per_node(term.get_arg_term(i))
+                                          for i in range(term.arity)))
+    elif term.is_var:
+        return term
+    return term.to_object()
+
+
+def bench_term_to_object(size=1000000):
+    eng = make_engine(NAT_PROGRAM)
+    try:
+        res, term = eng.exec_str("findall(X, nat({}, X), L)".format(size))
+        list_term = term.get_arg_term(2)
+        old = timeit(lambda: term_to_object_per_node(list_term), repeat=1)
+        new = timeit(lambda: list_term.to_object(), repeat=3)
+        report("term_to_object per node", size, old)
+        report("term_to_object stack (x{:.1f})".format(old / new), size, new)
+    finally:
+        eng.close()
+
+
+def object_to_term_per_element(eng, obj):
+    if isinstance(obj, list):
+        list_term = ffi.new("TERMptr")
+        eng.ls_make_list(list_term)
+        for element in reversed(obj):
+            eng.ls_push_list(list_term, object_to_term_per_element(eng, element).ID)
+        return eng._make_term_object(list_term)
+    return eng.object_to_term(obj)
+
+
+def bench_lazy_term(size=1000000, touched=10):
+    eng = make_engine(NAT_PROGRAM)
+    try:
+        res, term = eng.exec_str("findall(X, nat({}, X), L)".format(size))
+        list_term = term.get_arg_term(2)
+        full = timeit(lambda: list_term.to_object()[:touched], repeat=1)
+        lazy = timeit(lambda: list_term.lazy()[:touched], repeat=3)
+        report("to_object first {}".format(touched), size, full)
+        report("lazy first {} (x{:.1f})".format(touched, full / lazy), size, lazy)
+    finally:
+        eng.close()
+
+
+def bench_object_to_term(size=1000000):
+    eng = make_engine()
+    try:
+        ints = list(range(size))
+        floats = [float(i) for i in ints]
+        atoms = ["a{}".format(i % 100) for i in ints]
+        report("object_to_term per element", size,
+               timeit(lambda: object_to_term_per_element(eng, ints), repeat=1))
+        report("object_to_term ints", size, timeit(lambda: eng.object_to_term(ints)))
+        report("object_to_term floats", size, timeit(lambda: eng.object_to_term(floats)))
+        report("object_to_term atoms", size, timeit(lambda: eng.object_to_term(atoms)))
+        try:
+            import numpy as np
+        except ImportError:
+            return
+        arr = np.arange(size, dtype=np.float64)
+        report("object_to_term ndarray", size, timeit(lambda: eng.object_to_term(arr)))
+        arr2 = arr.reshape(-1, 10)
+        report("object_to_term ndarray 2-D", size, timeit(lambda: eng.object_to_term(arr2)))
+    finally:
+        eng.close()
+
+
+def bench_load_facts(size=1000000):
+    eng = make_engine()
+    try:
+        rows = [(i, i * 0.5, "a{}".format(i % 100)) for i in range(size)]
+        text_size = min(size, 100000)
+        seconds = timeit(lambda: [eng.assertz("text_fact({}, {}, {})".format(*row))
+                                  for row in rows[:text_size]], repeat=1)
+        report("assertz text", text_size, seconds)
+        report("load_facts rows", size,
+               timeit(lambda: eng.load_facts("row_fact", rows, mode="replace"), repeat=1))
+        columns = [list(column) for column in zip(*rows)]
+        report("load_facts columns", size,
+               timeit(lambda: eng.load_facts("col_fact", columns=columns, mode="replace"), repeat=1))
+    finally:
+        eng.close()
+
+
+def bench_consult(clauses=(1000, 100000)):
+    eng = make_engine()
+    try:
+        for size in clauses:
+            program = "\n".join("rule_{0}(X, Y):- X > {0}, Y is X * {0} + 1.".format(i)
+                                 for i in range(size))
+            report("consult_str stream ({:.1f}MB)".format(len(program) / 1e6), size,
+                   timeit(lambda: eng.reconsult_str(program, use_file=False), repeat=1))
+            report("consult_str file", size,
+                   timeit(lambda: eng.reconsult_str(program), repeat=1))
+    finally:
+        eng.close()
+
+
+def bench_startup(engines=20):
+    import subprocess
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    package = __name__.rpartition(".")[0]
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(package_dir))
+    code = "import {}.pyamzi".format(package)
+    report("import (subprocess)", 1, timeit(
+        lambda: subprocess.check_call([sys.executable, "-c", code], env=env), repeat=5))
+    report("import + engine (subprocess)", 1, timeit(
+        lambda: subprocess.check_call([sys.executable, "-c", code + "; {}.pyamzi.Engine('a').close()".format(package)],
+                                      env=env), repeat=5))
+
+    def create():
+        for _ in range(engines):
+            make_engine().close()
+    report("Engine() + init.xpl", engines, timeit(create))
+
+
+LOOP_PROGRAM = """
+loop(0, S, S):- !.
+loop(N, A, S):- A1 is A + N, N1 is N - 1, loop(N1, A1, S).
+"""
+
+
+def bench_parallel(goals=64, iterations=200000, max_processes=None):
+    from .parallel import ParallelEngine
+    max_processes = max_processes or os.cpu_count()
+    goal_list = ["loop({}, 0, S)".format(iterations + i) for i in range(goals)]
+    processes = 1
+    base = None
+    while True:
+        with ParallelEngine(processes, program=LOOP_PROGRAM) as peng:
+            seconds = timeit(lambda: peng.map(goal_list, method="query_one"), repeat=1)
+        base = base or seconds
+        report("parallel x{} (speedup {:.2f})".format(processes, base / seconds), goals, seconds)
+        if processes >= max_processes:
+            break
+        processes = min(processes * 2, max_processes)
+
+
+SIN_PROGRAM = """
+pycall_loop(0):- !.
+pycall_loop(N):- X is N * 0.001, pycall(sin, X, _), N1 is N - 1, pycall_loop(N1).
+direct_loop(0):- !.
+direct_loop(N):- X is N * 0.001, sin(X, _), N1 is N - 1, direct_loop(N1).
+"""
+
+
+def bench_register_predicate(size=100000):
+    import math
+    eng = make_engine()
+    try:
+        eng.register_predicate("sin", math.sin, 2, signature=(float,))
+        eng.reconsult_str(SIN_PROGRAM)
+        old = timeit(lambda: eng.exec_str("pycall_loop({})".format(size)), repeat=1)
+        new = timeit(lambda: eng.exec_str("direct_loop({})".format(size)), repeat=1)
+        report("pycall(sin, X, Y)", size, old)
+        report("registered sin/2 (x{:.1f})".format(old / new), size, new)
+    finally:
+        eng.close()
+
+
+def bench_exec_many(size=10000):
+    eng = make_engine("double(X, Y):- Y is X * 2.")
+    try:
+        goals = ["double({}, Y)".format(i) for i in range(size)]
+        old = timeit(lambda: [eng.exec_str(goal)[1].to_object() for goal in goals], repeat=1)
+        new = timeit(lambda: eng.exec_many(goals), repeat=3)
+        report("exec_str loop", size, old)
+        report("exec_many (x{:.1f})".format(old / new), size, new)
+        old = timeit(lambda: [eng.query_one(goal) for goal in goals], repeat=1)
+        new = timeit(lambda: eng.query_one_many(goals), repeat=3)
+        report("query_one loop", size, old)
+        report("query_one_many (x{:.1f})".format(old / new), size, new)
+    finally:
+        eng.close()
+
+
+def bench_snapshot(size=1000000):
+    import tempfile
+    rows = [(i, i * 0.5, "a{}".format(i % 100)) for i in range(size)]
+
+    def cold():
+        eng = make_engine(NAT_PROGRAM)
+        eng.load_facts("row_fact", rows)
+        return eng
+
+    folder = tempfile.mkdtemp(prefix="pyamzi_snapshot_")
+    filename = os.path.join(folder, "state.json")
+    eng = cold()
+    try:
+        eng.save_snapshot(filename)
+    finally:
+        eng.close()
+    report("cold start", size, timeit(lambda: cold().close(), repeat=1))
+    report("snapshot start", size, timeit(lambda: Engine.from_snapshot(filename).close(), repeat=1))
+
+
+BENCHMARKS = {
+    "find_all": bench_find_all,
+    "term_to_object": bench_term_to_object,
+    "lazy_term": bench_lazy_term,
+    "object_to_term": bench_object_to_term,
+    "load_facts": bench_load_facts,
+    "consult": bench_consult,
+    "startup": bench_startup,
+    "parallel": bench_parallel,
+    "register_predicate": bench_register_predicate,
+    "exec_many": bench_exec_many,
+    "snapshot": bench_snapshot,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print("== {}".format(name))
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    sys.exit(int(main() or 0))
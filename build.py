@@ -1,3 +1,5 @@
+import os
+import sys
 import cffi
 
 ffi = cffi.FFI()
@@ -70,6 +72,8 @@ typedef PRED_INITW * PRED_INITWptr;
 
 int lsInitW(ENGidptr, wchar_t*);
 int lsLoadW(ENGid, wchar_t*);
+int lsCall(ENGid, TERMptr);
+int lsExec(ENGid, TERMptr);
 int lsCallStrW(ENGid, TERMptr, wchar_t*);
 int lsExecStrW(ENGid, TERMptr, wchar_t*);
 pTYPE lsGetTermType(ENGid, TERM);
@@ -88,6 +92,9 @@ int lsMain(ENGid);
 int lsClose(ENGid);
 int lsSetStream(ENGid, STREAM, int);
 int lsSetOutputW(ENGid, void *, void *);
+int lsAsserta(ENGid, TERM);
+int lsAssertz(ENGid, TERM);
+int lsRetract(ENGid, TERM);
 int lsAssertzStrW(ENGid, wchar_t*);
 int lsAssertaStrW(ENGid, wchar_t*);
 int lsInitPredsW(ENGid, PRED_INITWptr);
@@ -107,9 +114,161 @@ void lsGetExceptMsgW(ENGid, wchar_t*, int);
 int lsSetInput(ENGid, void *, void *);
 """)
 
+accel_ffi = cffi.FFI()
+
+accel_ffi.cdef("""
+typedef struct {
+    int type;
+    long long ival;
+    double fval;
+    void *term;
+} pyamzi_item;
+
+int pyamzi_list_length(void *, void *);
+int pyamzi_list_items(void *, void *, pyamzi_item *, int);
+int pyamzi_struct_items(void *, void *, int, pyamzi_item *);
+int pyamzi_make_int_list(void *, void **, long *, int);
+int pyamzi_make_float_list(void *, void **, double *, int);
+void pyamzi_putc(void *, int);
+void pyamzi_puts(void *, wchar_t *);
+void pyamzi_output_drain(void);
+extern "Python" void pyamzi_output_flush(wchar_t *, int);
+""")
+
+ACCEL_SOURCE = r"""
+#include <wchar.h>
+#include "amzi.h"
+
+#if defined(_MSC_VER)
+#define PYAMZI_TLS __declspec(thread)
+#else
+#define PYAMZI_TLS __thread
+#endif
+
+#define PYAMZI_OUTPUT_SIZE 4096
+
+typedef struct {
+    int type;
+    long long ival;
+    double fval;
+    void *term;
+} pyamzi_item;
+
+static void pyamzi_output_flush(wchar_t *, int);
+
+static PYAMZI_TLS wchar_t pyamzi_output[PYAMZI_OUTPUT_SIZE];
+static PYAMZI_TLS int pyamzi_output_size = 0;
+
+static void pyamzi_fill_item(ENGid eid, TERM t, pyamzi_item *item)
+{
+    int i;
+    double d;
+    item->term = t;
+    item->type = lsGetTermType(eid, t);
+    item->ival = 0;
+    item->fval = 0.0;
+    if (item->type == pINT && lsGetTerm(eid, t, cINT, &i) == 0)
+        item->ival = i;
+    else if (item->type == pFLOAT && lsGetTerm(eid, t, cDOUBLE, &d) == 0)
+        item->fval = d;
+}
+
+int pyamzi_list_length(void *eid, void *list)
+{
+    int n = 0;
+    if (lsGetTermType((ENGid)eid, (TERM)list) != pLIST)
+        return 0;
+    while (list != NULL) {
+        n++;
+        list = lsGetTail((ENGid)eid, (TERM)list);
+    }
+    return n;
+}
+
+int pyamzi_list_items(void *eid, void *list, pyamzi_item *items, int cap)
+{
+    int n = 0;
+    TERM head;
+    while (list != NULL && n < cap) {
+        if (lsGetHead((ENGid)eid, (TERM)list, cTERM, &head) != 0)
+            return -1;
+        pyamzi_fill_item((ENGid)eid, head, &items[n++]);
+        list = lsGetTail((ENGid)eid, (TERM)list);
+    }
+    return n;
+}
+
+int pyamzi_struct_items(void *eid, void *term, int arity, pyamzi_item *items)
+{
+    int i;
+    TERM arg;
+    for (i = 0; i < arity; i++) {
+        if (lsGetArg((ENGid)eid, (TERM)term, i + 1, cTERM, &arg) != 0)
+            return -1;
+        pyamzi_fill_item((ENGid)eid, arg, &items[i]);
+    }
+    return arity;
+}
+
+int pyamzi_make_int_list(void *eid, void **list, long *values, int n)
+{
+    TERM t;
+    if (lsMakeList((ENGid)eid, (TERMptr)list) != 0)
+        return -1;
+    while (n-- > 0) {
+        if (lsMakeInt((ENGid)eid, &t, values[n]) != 0 || lsPushList((ENGid)eid, (TERMptr)list, t) != 0)
+            return -1;
+    }
+    return 0;
+}
+
+int pyamzi_make_float_list(void *eid, void **list, double *values, int n)
+{
+    TERM t;
+    if (lsMakeList((ENGid)eid, (TERMptr)list) != 0)
+        return -1;
+    while (n-- > 0) {
+        if (lsMakeFloat((ENGid)eid, &t, values[n]) != 0 || lsPushList((ENGid)eid, (TERMptr)list, t) != 0)
+            return -1;
+    }
+    return 0;
+}
+
+void pyamzi_output_drain(void)
+{
+    if (pyamzi_output_size > 0) {
+        int size = pyamzi_output_size;
+        pyamzi_output_size = 0;
+        pyamzi_output_flush(pyamzi_output, size);
+    }
+}
+
+void pyamzi_putc(void *ctx, int c)
+{
+    pyamzi_output[pyamzi_output_size++] = (wchar_t)c;
+    if (pyamzi_output_size == PYAMZI_OUTPUT_SIZE)
+        pyamzi_output_drain();
+}
+
+void pyamzi_puts(void *ctx, wchar_t *s)
+{
+    pyamzi_output_drain();
+    pyamzi_output_flush(s, (int)wcslen(s));
+}
+"""
+
+APLS_PATH = os.path.join(os.environ.get("PYAMZI_HOME") or os.path.dirname(os.path.abspath(__file__)), "apls")
+
+accel_ffi.set_source("_amzi_accel", ACCEL_SOURCE,
+                     include_dirs=[os.path.join(APLS_PATH, "include")],
+                     library_dirs=[os.path.join(APLS_PATH, "lib")],
+                     libraries=["amzi"])
+
+
 def main():
     ffi.compile(verbose=True)
+    if "accel" in sys.argv[1:]:
+        accel_ffi.compile(verbose=True)
 
 if __name__ == '__main__':
-    import sys
     sys.exit(int(main() or 0))
\ No newline at end of file
@@ -1,37 +1,106 @@
+import json
 import os
 from os import path
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
-from .utils import find_files
+from .utils import locate_file, file_hash
 
 
-cmp_path = find_files("acmp.exe")[0]
-lnk_path = find_files("alnk.exe")[0]
+def __getattr__(name):
+    if name == "cmp_path":
+        return locate_file("acmp.exe")
+    elif name == "lnk_path":
+        return locate_file("alnk.exe")
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 class Builder:
-    def __init__(self, folder):
+    def __init__(self, folder, cmp_path=None, lnk_path=None, processes=None):
         self.folder = path.abspath(folder)
-        self.xpl_filename = path.join(self.folder, path.basename(folder) + ".xpl")
+        self.xpl_filename = path.join(self.folder, path.basename(self.folder) + ".xpl")
+        self.manifest_filename = self.xpl_filename + ".manifest.json"
         self.pro_files = self.find("*.pro")
+        self.cmp_path = cmp_path or locate_file("acmp.exe")
+        self.lnk_path = lnk_path or locate_file("alnk.exe")
+        self.processes = processes or os.cpu_count()
+        self.timings = {}
 
     def load(self):
-        xpl_fn = self.xpl_filename
-        last_pro_time = max(os.stat(fn).st_mtime for fn in self.pro_files)
-        if not path.exists(xpl_fn) or last_pro_time > os.stat(xpl_fn).st_mtime:
-            self.build()
-            return self.load()
-        else:
-            return xpl_fn
-
-    def build(self):
+        self.build()
+        return self.xpl_filename
+
+    def compiler_version(self):
+        return file_hash(self.cmp_path)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_filename, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        with open(self.manifest_filename, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    def _compile(self, pro_fn):
+        start = time.perf_counter()
+        res = subprocess.call([self.cmp_path, pro_fn])
+        return pro_fn, res, time.perf_counter() - start
+
+    def build(self, force=False):
+        start = time.perf_counter()
+        self.timings = {}
+        manifest = self._read_manifest()
+        version = self.compiler_version()
+        built = manifest.get("files", {}) if manifest.get("compiler") == version else {}
+
+        hashes = {}
+        stale = []
         for pro_fn in self.pro_files:
-            plm_fn = pro_fn.replace(".pro", ".plm")
-            if not path.exists(plm_fn) or os.stat(plm_fn) < os.stat(pro_fn):
-                cmd = [cmp_path, pro_fn]
-                subprocess.call(cmd)
-        plm_files = self.find("*.plm")
-        subprocess.call([lnk_path, self.xpl_filename] + plm_files)
+            name = path.basename(pro_fn)
+            hashes[name] = file_hash(pro_fn)
+            plm_fn = path.splitext(pro_fn)[0] + ".plm"
+            if force or built.get(name) != hashes[name] or not path.exists(plm_fn):
+                stale.append(pro_fn)
+
+        files = {name: digest for name, digest in built.items() if name in hashes}
+        failed = []
+        with ThreadPoolExecutor(self.processes) as pool:
+            for pro_fn, res, seconds in pool.map(self._compile, stale):
+                name = path.basename(pro_fn)
+                self.timings[name] = seconds
+                if res == 0:
+                    files[name] = hashes[name]
+                else:
+                    files.pop(name, None)
+                    failed.append((pro_fn, res))
+
+        plm_files = sorted(self.find("*.plm"))
+        plm_names = [path.basename(fn) for fn in plm_files]
+        if not failed and (stale or not path.exists(self.xpl_filename) or manifest.get("linked") != plm_names):
+            link_start = time.perf_counter()
+            res = subprocess.call([self.lnk_path, self.xpl_filename] + plm_files)
+            self.timings["link"] = time.perf_counter() - link_start
+            if res != 0:
+                failed.append((self.xpl_filename, res))
+            else:
+                manifest["linked"] = plm_names
+
+        manifest["compiler"] = version
+        manifest["files"] = files
+        self._write_manifest(manifest)
+        self.timings["total"] = time.perf_counter() - start
+        if failed:
+            filename, res = failed[0]
+            raise subprocess.CalledProcessError(res, filename)
+        return self.timings
+
+    def report(self):
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            print("{:<40} {:>8.3f}s".format(name, seconds))
 
     def find(self, pattern):
         return glob(path.join(self.folder, pattern))
@@ -40,6 +109,7 @@ def main():
     import sys
     builder = Builder(sys.argv[1])
     print(builder.load())
+    builder.report()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+_MISSING = object()
+_LIST = object()
+
+
+def make_key(obj):
+    if isinstance(obj, list):
+        return (_LIST, tuple(make_key(item) for item in obj))
+    elif isinstance(obj, tuple):
+        items = tuple(make_key(item) for item in obj)
+        return type(obj)(*items) if hasattr(obj, "_fields") else items
+    elif isinstance(obj, dict):
+        return frozenset((key, make_key(value)) for key, value in obj.items())
+    hash(obj)
+    return obj
+
+
+class LRUCache:
+    def __init__(self, maxsize=128, ttl=None, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._get(key, default)
+
+    def _get(self, key, default):
+        item = self._data.get(key, _MISSING)
+        if item is not _MISSING:
+            value, expires = item
+            if expires is None or expires > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    old_key, (old_value, _) = self._data.popitem(last=False)
+                    self.evictions += 1
+                    evicted.append((old_key, old_value))
+        if self.on_evict is not None:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+
+    def call(self, func, args):
+        try:
+            key = make_key(args)
+        except TypeError:
+            return func(*args)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = func(*args)
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=_MISSING):
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+def memoize(func=None, maxsize=128, ttl=None):
+    def decorator(func):
+        func.pyamzi_cache = LRUCache(maxsize, ttl)
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def copy_result(obj):
+    if isinstance(obj, list):
+        return [copy_result(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: copy_result(value) for key, value in obj.items()}
+    elif isinstance(obj, tuple) and hasattr(obj, "_fields"):
+        return type(obj)(*(copy_result(item) for item in obj))
+    elif isinstance(obj, tuple):
+        return tuple(copy_result(item) for item in obj)
+    return obj
+
+
+class QueryCache(LRUCache):
+    def __init__(self, maxsize=1024, scoped=False):
+        super().__init__(maxsize)
+        self.scoped = scoped
+        self.generation = 0
+        self._generations = defaultdict(int)
+        self._dependents = defaultdict(set)
+
+    def bump(self, name=None):
+        with self._lock:
+            if name is None or not self.scoped:
+                self.generation += 1
+                return
+            pending = [name]
+            seen = set()
+            while pending:
+                name = pending.pop()
+                if name not in seen:
+                    seen.add(name)
+                    self._generations[name] += 1
+                    pending.extend(self._dependents.get(name, ()))
+
+    def add_dependency(self, name, *depends_on):
+        with self._lock:
+            for other in depends_on:
+                self._dependents[other].add(name)
+
+    def _stamp(self, names):
+        if not self.scoped:
+            return self.generation
+        generations = self._generations
+        return self.generation, tuple(generations.get(name, 0) for name in sorted(names))
+
+    def lookup(self, key, names, default=None):
+        with self._lock:
+            item = self._get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            stamp, value = item
+            if stamp != self._stamp(names):
+                self._data.pop(key, None)
+                self.hits -= 1
+                self.misses += 1
+                return default
+            return value
+
+    def store(self, key, names, value):
+        with self._lock:
+            stamp = self._stamp(names)
+        self.set(key, (stamp, value))
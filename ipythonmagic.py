@@ -1,3 +1,4 @@
+from itertools import islice
 from IPython.core import magic_arguments
 from IPython.core.magic import Magics, magics_class, cell_magic, line_cell_magic, line_magic
 from .pyamzi import Engine
@@ -74,9 +75,13 @@ class AmziMagics(Magics):
 
     @line_cell_magic
     def query_all(self, line='', cell=None):
-        eng, code = self._line_cell_help(line, cell)
-        res = eng.query_all(code)
-        return list(res)
+        opts, stmt = self.parse_options(line, 'n:cdl:', posix=False, strict=False)
+        eng = self.get_engine(opts)
+        code = cell if cell is not None else stmt
+        limit = int(opts["l"]) if "l" in opts else None
+        if "c" in opts or "d" in opts:
+            return eng.query_columns(code, limit=limit, dataframe="d" in opts)
+        return list(islice(eng.query_all(code), limit))
 
     @line_cell_magic
     def find_all(self, line='', cell=None):
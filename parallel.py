@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import types
+import uuid
+from collections import deque
+from multiprocessing.connection import wait
+from .pyamzi import Engine, AmziError, Struct, Term
+
+
+def _plain(obj):
+    if isinstance(obj, list):
+        return [_plain(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: _plain(value) for key, value in obj.items()}
+    elif isinstance(obj, Struct):
+        return Struct(obj.functor, tuple(_plain(item) for item in obj.arguments))
+    elif isinstance(obj, Term):
+        return str(obj)
+    return obj
+
+
+def _make_engine(config):
+    eng = Engine("{}-{}".format(config["name"], os.getpid()), load_init=config["load_init"])
+    if config["xpl"] is not None:
+        eng.load(config["xpl"])
+    for filename in config["files"]:
+        eng.consult(filename)
+    if config["program"] is not None:
+        eng.consult_str(config["program"])
+    if config["setup"] is not None:
+        config["setup"](eng)
+    return eng
+
+
+def _worker_main(config, conn):
+    eng = _make_engine(config)
+    try:
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+            task_id, method, calls = task
+            try:
+                results = []
+                for args, kw in calls:
+                    res = getattr(eng, method)(*args, **kw)
+                    if isinstance(res, types.GeneratorType):
+                        res = list(res)
+                    results.append(_plain(res))
+                conn.send((task_id, True, results))
+            except Exception as e:
+                conn.send((task_id, False, "{}: {}".format(type(e).__name__, e)))
+    finally:
+        eng.close()
+
+
+def _in_order(results):
+    pending = {}
+    next_id = 0
+    for i, res in results:
+        pending[i] = res
+        while next_id in pending:
+            yield pending.pop(next_id)
+            next_id += 1
+
+
+class _Worker:
+    def __init__(self, ctx, config):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(config, child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+
+    def send(self, task):
+        self.task = task
+        self.conn.send(task)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class ParallelEngine:
+    def __init__(self, processes=None, name=None, load_init=True, xpl=None, program=None,
+                 files=(), setup=None, max_retries=2, start_method=None):
+        self.processes = processes or os.cpu_count()
+        self.max_retries = max_retries
+        self.restarts = 0
+        self._config = {
+            "name": name or str(uuid.uuid1()),
+            "load_init": load_init,
+            "xpl": xpl,
+            "program": program,
+            "files": list(files),
+            "setup": setup,
+        }
+        self._ctx = multiprocessing.get_context(start_method)
+        self._workers = [_Worker(self._ctx, self._config) for _ in range(self.processes)]
+
+    def _restart(self, worker):
+        self.restarts += 1
+        worker.conn.close()
+        worker.process.join()
+        index = self._workers.index(worker)
+        self._workers[index] = _Worker(self._ctx, self._config)
+        return self._workers[index]
+
+    def _run(self, method, calls, chunksize):
+        tasks = deque()
+        for i in range(0, len(calls), chunksize):
+            tasks.append((i, method, calls[i:i + chunksize]))
+        retries = {}
+        idle = list(self._workers)
+        busy = {}
+        try:
+            yield from self._dispatch(tasks, retries, idle, busy)
+        finally:
+            for worker in set(busy.values()):
+                try:
+                    worker.conn.recv()
+                    worker.task = None
+                except (EOFError, OSError):
+                    self._restart(worker)
+
+    def _crashed(self, worker, task, retries, tasks, idle):
+        retries[task[0]] = retries.get(task[0], 0) + 1
+        worker = self._restart(worker)
+        idle.append(worker)
+        if retries[task[0]] > self.max_retries:
+            raise AmziError("Worker crashed {} times on {}".format(retries[task[0]], task[2]))
+        tasks.appendleft(task)
+
+    def _dispatch(self, tasks, retries, idle, busy):
+        while tasks or busy:
+            while tasks and idle:
+                worker = idle.pop()
+                task = tasks.popleft()
+                try:
+                    worker.send(task)
+                except OSError:
+                    self._crashed(worker, task, retries, tasks, idle)
+                    continue
+                busy[worker.conn] = worker
+                busy[worker.process.sentinel] = worker
+
+            for ready in wait(list(busy)):
+                worker = busy.get(ready)
+                if worker is None or worker.task is None:
+                    continue
+                task = worker.task
+                try:
+                    task_id, ok, results = worker.conn.recv()
+                except (EOFError, OSError):
+                    del busy[worker.conn], busy[worker.process.sentinel]
+                    self._crashed(worker, task, retries, tasks, idle)
+                    continue
+                worker.task = None
+                del busy[worker.conn], busy[worker.process.sentinel]
+                idle.append(worker)
+                if not ok:
+                    raise AmziError(results)
+                for i, res in enumerate(results):
+                    yield task_id + i, res
+
+    def imap_unordered(self, goals, method="find_all", chunksize=1, **kw):
+        calls = [((goal,), kw) for goal in goals]
+        return self._run(method, calls, chunksize)
+
+    def imap(self, goals, method="find_all", chunksize=1, **kw):
+        return _in_order(self.imap_unordered(goals, method, chunksize, **kw))
+
+    def map(self, goals, method="find_all", chunksize=1, **kw):
+        return list(self.imap(goals, method, chunksize, **kw))
+
+    def partition(self, query, var, values, parts=None, ordered=True):
+        values = list(values)
+        parts = parts or self.processes
+        chunksize = max(1, -(-len(values) // parts))
+        template = "member({}, {{values}}), ({})".format(var, query)
+        calls = [((template,), {"values": values[i:i + chunksize]})
+                 for i in range(0, len(values), chunksize)]
+        results = self._run("query_all", calls, 1)
+        if ordered:
+            results = enumerate(_in_order(results))
+        for _, rows in results:
+            yield from rows
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from .pyamzi import Engine, AmziError
+
+
+class EnginePool:
+    def __init__(self, size, name="pool", load_init=True, xpl=None, program=None, setup=None):
+        self.size = size
+        self.name = name
+        self._engines = []
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._latency = 0.0
+        self._max_latency = 0.0
+        self._hold_time = 0.0
+        self._max_hold_time = 0.0
+        for i in range(size):
+            eng = self._make_engine(i, load_init, xpl, program, setup)
+            self._engines.append(eng)
+            self._idle.put(eng)
+
+    def _make_engine(self, i, load_init, xpl, program, setup):
+        eng = Engine("{}-{}".format(self.name, i), load_init=load_init)
+        if xpl is not None:
+            eng.load(xpl)
+        if program is not None:
+            eng.consult_str(program)
+        if setup is not None:
+            setup(eng)
+        return eng
+
+    @property
+    def engines(self):
+        return list(self._engines)
+
+    def acquire(self, timeout=None):
+        start = time.perf_counter()
+        try:
+            eng = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                eng = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise AmziError("No engine available in pool {} after {}s".format(self.name, timeout))
+            with self._lock:
+                wait_time = time.perf_counter() - start
+                self._waits += 1
+                self._wait_time += wait_time
+                self._max_wait_time = max(self._max_wait_time, wait_time)
+        eng.owner = threading.get_ident()
+        eng._checkout_time = time.perf_counter()
+        latency = eng._checkout_time - start
+        with self._lock:
+            self._checkouts += 1
+            self._latency += latency
+            self._max_latency = max(self._max_latency, latency)
+        return eng
+
+    def release(self, eng):
+        if eng.owner != threading.get_ident():
+            raise AmziError("Engine {} is released by a thread that doesn't own it".format(eng.name))
+        hold_time = time.perf_counter() - eng._checkout_time
+        try:
+            eng.reset()
+        finally:
+            eng.owner = None
+            with self._lock:
+                self._hold_time += hold_time
+                self._max_hold_time = max(self._max_hold_time, hold_time)
+            self._idle.put(eng)
+
+    @contextmanager
+    def engine(self, timeout=None):
+        eng = self.acquire(timeout)
+        try:
+            yield eng
+        finally:
+            self.release(eng)
+
+    def stats(self):
+        with self._lock:
+            checkouts = self._checkouts
+            available = self._idle.qsize()
+            return {
+                "size": self.size,
+                "available": available,
+                "in_use": self.size - available,
+                "checkouts": checkouts,
+                "waits": self._waits,
+                "wait_time": self._wait_time,
+                "max_wait_time": self._max_wait_time,
+                "mean_wait_time": self._wait_time / self._waits if self._waits else 0.0,
+                "checkout_latency": self._latency,
+                "max_checkout_latency": self._max_latency,
+                "mean_checkout_latency": self._latency / checkouts if checkouts else 0.0,
+                "hold_time": self._hold_time,
+                "max_hold_time": self._max_hold_time,
+            }
+
+    def close(self):
+        for eng in self._engines:
+            eng.close()
+        self._engines = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
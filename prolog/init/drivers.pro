@@ -0,0 +1,87 @@
+% Driver predicates used by pyamzi.Engine. They live in the user module
+% under 'pyamzi$' names and are consulted at engine start when init.xpl
+% doesn't already contain them.
+
+'pyamzi$drivers'.
+
+'pyamzi$find_chunks'(Template, Goal, Size, Chunk):-
+    findall(Template, Goal, Items),
+    Items \== [],
+    'pyamzi$split_chunks'(Items, Size, Chunk).
+
+'pyamzi$split_chunks'(Items, Size, Chunk):-
+    'pyamzi$take'(Size, Items, Head, Rest),
+    (   Rest == []
+    ->  Chunk = Head
+    ;   (   Chunk = Head
+        ;   'pyamzi$split_chunks'(Rest, Size, Chunk)
+        )
+    ).
+
+'pyamzi$take'(0, Rest, [], Rest):- !.
+'pyamzi$take'(_, [], [], []):- !.
+'pyamzi$take'(N, [X|Xs], [X|Ys], Rest):-
+    N1 is N - 1,
+    'pyamzi$take'(N1, Xs, Ys, Rest).
+
+'pyamzi$exec_many'([], []).
+'pyamzi$exec_many'([Goal|Goals], [Result|Results]):-
+    'pyamzi$exec_one'(Goal, Result),
+    'pyamzi$exec_many'(Goals, Results).
+
+'pyamzi$exec_one'(Goal, Result):-
+    catch(
+        (   'pyamzi$goal_term'(Goal, Term),
+            call(Term)
+        ->  Result = true(Term)
+        ;   Result = false
+        ),
+        Error,
+        Result = error(Error)).
+
+'pyamzi$query_one_many'([], []).
+'pyamzi$query_one_many'([Query|Queries], [Result|Results]):-
+    'pyamzi$query_one'(Query, Result),
+    'pyamzi$query_one_many'(Queries, Results).
+
+'pyamzi$query_one'(Query, Result):-
+    catch(
+        (   'pyamzi$goal_string'(Query, String),
+            varlist_query(String, Bindings, _)
+        ->  Result = true(Bindings)
+        ;   Result = false
+        ),
+        Error,
+        Result = error(Error)).
+
+'pyamzi$goal_term'(Goal, Goal):- atom(Goal), !.
+'pyamzi$goal_term'(String, Term):-
+    string_term(String, Term).
+
+'pyamzi$goal_string'(Goal, String):- atom(Goal), !,
+    string_atom(String, Goal).
+'pyamzi$goal_string'(String, String).
+
+'pyamzi$save_clauses'(File, Skip):-
+    open(File, write, S),
+    (   current_predicate(Name/Arity),
+        \+ 'pyamzi$internal'(Name),
+        \+ member(Name/Arity, Skip),
+        writeq(S, (:- dynamic(Name/Arity))), write(S, '.'), nl(S),
+        functor(Head, Name, Arity),
+        clause(Head, Body),
+        'pyamzi$write_clause'(S, Head, Body),
+        fail
+    ;   true
+    ),
+    close(S).
+
+'pyamzi$internal'(Name):-
+    atom_codes(Name, Codes),
+    atom_codes('pyamzi$', Prefix),
+    append(Prefix, _, Codes).
+
+'pyamzi$write_clause'(S, Head, true):- !,
+    writeq(S, Head), write(S, '.'), nl(S).
+'pyamzi$write_clause'(S, Head, Body):-
+    writeq(S, (Head :- Body)), write(S, '.'), nl(S).
@@ -1,13 +1,46 @@
+import array
+import json
+import logging
 import os
 import re
-from collections import namedtuple
+import subprocess
+import sys
+import tempfile
+import uuid
+import threading
+import time
+from functools import partial
+from itertools import islice, chain
+from collections import namedtuple, deque
+from collections.abc import Iterable, Sequence
+from contextlib import contextmanager
 from io import StringIO
 from ._amzi import ffi
 from . import funcexport
-from .utils import split_clauses, find_files
+from . import accel
+from .cache import LRUCache, QueryCache, make_key, copy_result
+from .utils import split_clauses, locate_file, parse_query_template, normalize_query, file_hash
 
 
-lib = ffi.dlopen(find_files("amzi.dll")[0])
+class _Library:
+    def __init__(self):
+        self._lib = None
+
+    def _load(self):
+        if self._lib is None:
+            self._lib = ffi.dlopen(locate_file("amzi.dll"))
+        return self._lib
+
+    def __getattr__(self, name):
+        value = getattr(self._load(), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+lib = _Library()
 
 
 RC_FUNCS = {
@@ -25,6 +58,8 @@ RC_FUNCS = {
     "lsSetOutputW",
     "lsAssertzStrW",
     "lsAssertaStrW",
+    "lsAsserta",
+    "lsAssertz",
     "lsInitPredsW",
     "lsAddPredW",
     "lsGetParm",
@@ -39,6 +74,34 @@ RC_FUNCS = {
 }
 
 
+ATOM_PATTERN = re.compile(r"^\w+$")
+CLAUSE_HEAD_PATTERN = re.compile(r"\s*\(?\s*([a-z]\w*)")
+DB_UPDATE_PATTERN = re.compile(r"\b(?:assert[az]?|retract(?:all)?|abolish|erase|(?:re)?consult|load)\s*\(")
+_MISSING = object()
+_INT_RANGE = range(-2 ** 31, 2 ** 31)
+
+
+_LIB_FUNCS = {}
+
+
+def lib_func_name(name):
+    func_name = name
+    if func_name.startswith("ls"):
+        func_name = func_name[2:]
+    if func_name.endswith("W"):
+        func_name = func_name[:-1]
+    func_name = "_".join(x.lower() for x in re.split("([A-Z][a-z]+)", func_name) if x)
+    return "ls_" + func_name
+
+
+def lib_functions():
+    if not _LIB_FUNCS:
+        for name in dir(lib):
+            if name.startswith("ls"):
+                _LIB_FUNCS[lib_func_name(name)] = (name, name in RC_FUNCS)
+    return _LIB_FUNCS
+
+
 def convert_atom(buf):
     s = ffi.string(buf)
     if s == "[]":
@@ -47,6 +110,24 @@ def convert_atom(buf):
         return s
 
 
+def contains_term(obj):
+    if isinstance(obj, Term):
+        return True
+    elif isinstance(obj, dict):
+        return any(contains_term(value) for value in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return any(contains_term(item) for item in obj)
+    return False
+
+
+def convert_real(text):
+    text = text.rstrip("r")
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
 class AmziError(Exception):
     pass
 
@@ -55,6 +136,9 @@ class Struct(namedtuple("Struct", "functor arguments")):
     def __str__(self):
         return "{}({})".format(self.functor, ", ".join(map(str, self.arguments)))
 
+
+GoalResult = namedtuple("GoalResult", "success result error")
+
 class StreamInput:
     def __init__(self, eng):
         self.getc = ffi.callback("int(void *)")(self._getc)
@@ -70,31 +154,38 @@ class StreamInput:
 
 class StringInput(StreamInput):
     def __init__(self, eng):
-        self.buffer = StringIO("")
+        self.set_text("")
         super().__init__(eng)
 
     def _getc(self, void):
-        s = self.buffer.read(1)
-        if s:
-            return ord(s)
+        pos = self.pos
+        if pos < self.size:
+            self.pos = pos + 1
+            return ord(self.text[pos])
         else:
             return 0
 
     def _ungetc(self, void, c):
-        self.buffer.seek(-2, os.SEEK_SET)
-        return ord(self.buffer.read(1))
+        if self.pos > 0:
+            self.pos -= 1
+        return c
 
     def set_text(self, text):
-        self.buffer = StringIO(text)
+        self.text = text
+        self.size = len(text)
+        self.pos = 0
 
 
 class StreamOutput:
     def __init__(self, eng):
         self.putc = ffi.callback("void(void *, int)")(self._putc)
         self.puts = ffi.callback("void(void *, wchar_t *)")(self._puts)
-        eng.ls_set_output(self.putc, self.puts)
+        self.attach(eng)
         self.mute = False
 
+    def attach(self, eng):
+        eng.ls_set_output(self.putc, self.puts)
+
     def _putc(self, void, c):
         if not self.mute:
             print(chr(c), end='')
@@ -103,6 +194,18 @@ class StreamOutput:
         if not self.mute:
             print(ffi.string(s), end='')
 
+    def clear(self):
+        pass
+
+    def start_query(self):
+        pass
+
+    def resume_query(self):
+        pass
+
+    def end_query(self):
+        pass
+
 
 class StringOutput(StreamOutput):
     def __init__(self, eng):
@@ -120,31 +223,163 @@ class StringOutput(StreamOutput):
     def get_value(self):
         return self.buffer.getvalue()
 
+    def clear(self):
+        self.buffer = StringIO()
+
     def read(self):
         return self.buffer.read()
 
 
+class BufferedOutput(StreamOutput):
+    def __init__(self, eng, sink=None, block_size=8192, max_size=None):
+        self.sink = sink
+        self.block_size = block_size
+        self.max_size = max_size
+        self.bytes_written = 0
+        self._query_start = 0
+        self._chars = []
+        self._chunks = deque()
+        self._size = 0
+        super().__init__(eng)
+        self._accel = accel.available()
+        if self._accel:
+            self.putc, self.puts = accel.output_callbacks()
+            self.attach(eng)
+
+    def _putc(self, void, c):
+        if not self.mute:
+            chars = self._chars
+            chars.append(c)
+            if len(chars) >= self.block_size:
+                self.flush()
+
+    def _puts(self, void, s):
+        if not self.mute:
+            self.flush()
+            self._write(ffi.string(s))
+
+    def _write(self, text):
+        self.bytes_written += len(text.encode("utf-8"))
+        if self.sink is not None:
+            self.sink.write(text)
+            return
+        self._chunks.append(text)
+        self._size += len(text)
+        if self.max_size is not None:
+            chunks = self._chunks
+            while len(chunks) > 1 and self._size - len(chunks[0]) >= self.max_size:
+                self._size -= len(chunks.popleft())
+            if self._size > self.max_size:
+                extra = self._size - self.max_size
+                chunks[0] = chunks[0][extra:]
+                self._size -= extra
+
+    def flush(self):
+        if self._accel:
+            accel.drain_output(self)
+        if self._chars:
+            text = "".join(map(chr, self._chars))
+            self._chars = []
+            self._write(text)
+
+    def get_value(self):
+        self.flush()
+        return "".join(self._chunks)
+
+    def clear(self):
+        self._chars = []
+        self._chunks.clear()
+        self._size = 0
+
+    def start_query(self):
+        self.flush()
+        self._query_start = self.bytes_written
+        self.resume_query()
+
+    def resume_query(self):
+        if self._accel:
+            accel.set_output(self)
+
+    def end_query(self):
+        self.flush()
+        if self.sink is not None and hasattr(self.sink, "flush"):
+            self.sink.flush()
+
+    @property
+    def query_bytes(self):
+        self.flush()
+        return self.bytes_written - self._query_start
+
+
+class LineSink:
+    def __init__(self):
+        self._partial = ""
+
+    def write(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self.write_line(line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._partial:
+            self.write_line(self._partial)
+            self._partial = ""
+
+    def write_line(self, line):
+        raise NotImplementedError
+
+
+class FileSink(LineSink):
+    def __init__(self, file, mode="a", encoding="utf-8"):
+        super().__init__()
+        self._own_file = isinstance(file, str)
+        self.file = open(file, mode, encoding=encoding) if self._own_file else file
+
+    def write_line(self, line):
+        self.file.write(line + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        if self._own_file:
+            self.file.close()
+
+
+class LoggingSink(LineSink):
+    def __init__(self, logger=None, level=logging.INFO):
+        super().__init__()
+        self.logger = logger or logging.getLogger("pyamzi")
+        self.level = level
+
+    def write_line(self, line):
+        self.logger.log(self.level, line)
+
+
 class Term:
-    def __init__(self, eng, term_ptr):
+    __slots__ = ("eng", "ID", "_type_id", "_functor", "_arity")
+
+    def __init__(self, eng, term_id):
         self.eng = eng
-        self._term_id = term_ptr
+        self.ID = term_id
+        self._type_id = None
         self._functor = None
         self._arity = None
-        self._type_id = None
 
     @property
     def type_id(self):
         if self._type_id is None:
-            self._type_id = self.eng.ls_get_term_type(self.ID)
+            self._type_id = lib.lsGetTermType(self.eng.ID, self.ID)
         return self._type_id
 
-    @property
-    def ID(self):
-        return self._term_id[0]
-
     @property
     def address(self):
-        return self._term_id
+        return ffi.new("TERMptr", self.ID)
 
     @property
     def functor(self):
@@ -154,13 +389,7 @@ class Term:
 
     @property
     def arguments(self):
-        args = []
-        for i in range(self.arity):
-            term = self.get_arg_term(i)
-            if term is not None:
-                term = term.to_object()
-            args.append(term)
-        return tuple(args)
+        return LazyStruct(self)
 
     @property
     def arity(self):
@@ -170,19 +399,14 @@ class Term:
 
     @property
     def head(self):
-        term_ptr = ffi.new("TERMptr")
-        self.eng.ls_get_head(self.ID, lib.cTERM, term_ptr)
-        if term_ptr[0] == ffi.NULL:
-            return None
-        return self.eng._make_term_object(term_ptr)
+        cell = self.eng._scratch_term
+        self.eng.ls_get_head(self.ID, lib.cTERM, cell)
+        return self.eng._make_term_object(cell)
 
     @property
     def tail(self):
-        term_ptr = ffi.new("TERMptr")
-        term_ptr[0] = self.eng.ls_get_tail(self.ID)
-        if term_ptr[0] == ffi.NULL:
-            return None
-        return self.eng._make_term_object(term_ptr)
+        term_id = lib.lsGetTail(self.eng.ID, self.ID)
+        return Term(self.eng, term_id) if term_id != ffi.NULL else None
 
     @property
     def is_list(self):
@@ -222,11 +446,20 @@ class Term:
     def to_object(self):
         return self.eng.term_to_object(self)
 
+    def to_numpy(self, dtype=None):
+        return self.eng.term_to_numpy(self.ID, dtype)
+
+    def lazy(self):
+        if self.is_list:
+            return LazyList(self)
+        elif self.is_struct:
+            return LazyStruct(self)
+        return self.to_object()
+
     def _get_functor(self):
-        arity = ffi.new("ARITY *")
+        arity = self.eng._scratch_arity
         self.eng.ls_get_fa(self.ID, self.eng.buffer, arity)
-        functor = ffi.string(self.eng.buffer)
-        self._functor = functor
+        self._functor = ffi.string(self.eng.buffer)
         self._arity = int(arity[0])
 
     def _get_arg_types(self):
@@ -234,11 +467,9 @@ class Term:
                     for i in range(1, self.arity + 1)]
 
     def get_arg_term(self, i):
-        term_ptr = ffi.new("TERMptr")
-        self.eng.ls_get_arg(self.ID, i+1, lib.cTERM, term_ptr)
-        if term_ptr[0] == ffi.NULL:
-            return None
-        return self.eng._make_term_object(term_ptr)
+        cell = self.eng._scratch_term
+        self.eng.ls_get_arg(self.ID, i+1, lib.cTERM, cell)
+        return self.eng._make_term_object(cell)
 
     def __str__(self):
         buf = self.eng.buffer
@@ -250,24 +481,425 @@ class Term:
         return str(self)
 
 
+class LazyStruct(Sequence):
+    __slots__ = ("term", "functor", "_items")
+
+    def __init__(self, term):
+        self.term = term
+        self.functor = term.functor
+        self._items = [_MISSING] * term.arity
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self._items))))
+        item = self._items[index]
+        if item is _MISSING:
+            arg = self.term.get_arg_term(index % len(self._items))
+            item = self._items[index] = arg.to_object() if arg is not None else None
+        return item
+
+    def __eq__(self, other):
+        if isinstance(other, (tuple, list, Sequence)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return "({})".format(", ".join(map(repr, self)))
+
+
+class LazyList(Sequence):
+    __slots__ = ("term", "_items", "_next", "_length")
+
+    def __init__(self, term):
+        self.term = term
+        self._items = []
+        self._next = term.ID
+        self._length = None
+
+    def _fetch(self, stop):
+        eng = self.term.eng
+        eng_id = eng.ID
+        cell = eng._scratch_term
+        items = self._items
+        while self._next != ffi.NULL and (stop is None or len(items) < stop):
+            lib.lsGetHead(eng_id, self._next, lib.cTERM, cell)
+            items.append(eng.convert_term(cell[0]))
+            self._next = lib.lsGetTail(eng_id, self._next)
+
+    def __len__(self):
+        if self._length is None:
+            eng_id = self.term.eng.ID
+            length = len(self._items)
+            term_id = self._next
+            while term_id != ffi.NULL:
+                length += 1
+                term_id = lib.lsGetTail(eng_id, term_id)
+            self._length = length
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index >= len(self._items):
+            self._fetch(index + 1)
+        return self._items[index]
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i >= len(self._items):
+                self._fetch(i + 1)
+                if i >= len(self._items):
+                    return
+            yield self._items[i]
+            i += 1
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, Sequence)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class PreparedQuery:
+    functor = "pyamzi$query"
+
+    def __init__(self, eng, template):
+        self.eng = eng
+        self.template = template
+        goal, self.params, self.variables = parse_query_template(template)
+        self.id = eng._new_query_id()
+        head = "{}({}, [{}], [{}])".format(
+            self.functor, self.id,
+            ", ".join("PYAMZI_{}".format(name) for name in self.params),
+            ", ".join(self.variables))
+        eng.ls_assertz_str("{} :- {}".format(head, goal))
+        self._functor = eng.get_wchar_array(self.functor, cache=True)
+        self._closed = False
+
+    def _make_goal(self, kw):
+        if self._closed:
+            raise AmziError("{!r} is closed".format(self))
+        missing = [name for name in self.params if name not in kw]
+        if missing:
+            raise KeyError("Missing query parameters: {}".format(", ".join(missing)))
+        eng = self.eng
+        goal = ffi.new("TERMptr")
+        eng.ls_make_fa(goal, self._functor, 3)
+        eng.ls_unify_arg(goal, 1, lib.cTERM, eng.object_to_term(self.id).address)
+        params = eng.object_to_term([kw[name] for name in self.params])
+        eng.ls_unify_arg(goal, 2, lib.cTERM, params.address)
+        return goal
+
+    def _bindings(self, term):
+        return dict(zip(self.variables, term.get_arg_term(2).to_object()))
+
+    def query_one(self, **kw):
+        res, term = self.eng.exec_term(self._make_goal(kw))
+        if not res:
+            return None
+        return self._bindings(term)
+
+    def cursor(self, limit=None, offset=0, **kw):
+        goal = self._make_goal(kw)
+        return Cursor(self.eng, partial(self.eng.call_term, goal), self._bindings, limit, offset)
+
+    def query_all(self, **kw):
+        with self.cursor(**kw) as cursor:
+            yield from cursor
+
+    def close(self):
+        if not self._closed:
+            self.eng.exec_str("retract(({}({}, _, _) :- _))".format(self.functor, self.id))
+            self._closed = True
+
+    def __repr__(self):
+        return "PreparedQuery({!r})".format(self.template)
+
+
+def varlist_bindings(term):
+    query_res = term.get_arg_term(2).to_object()
+    return dict(zip(query_res[::2], query_res[1::2]))
+
+
+class Cursor:
+    arraysize = 100
+
+    def __init__(self, eng, open_call, convert, limit=None, offset=0):
+        self.eng = eng
+        self.limit = limit
+        self.offset = offset
+        self.rowcount = 0
+        self._open_call = open_call
+        self._convert = convert
+        self._term = None
+        self._exhausted = False
+        self._closed = False
+
+    @property
+    def closed(self):
+        return self._closed or self._exhausted
+
+    def _open(self):
+        res, term = self._open_call()
+        if not res or term is None:
+            self._exhausted = True
+            return False
+        self._term = term
+        self.eng._cursors.append(self)
+        for _ in range(self.offset):
+            if not self._advance():
+                return False
+        return True
+
+    def _advance(self):
+        self.eng._close_cursors_above(self)
+        res, _ = self.eng.redo()
+        if not res:
+            self._exhausted = True
+            self.eng._cursors.remove(self)
+        return res
+
+    def _next_row(self):
+        if self.closed:
+            return _MISSING
+        if self.limit is not None and self.rowcount >= self.limit:
+            self.close()
+            return _MISSING
+        if self._term is None:
+            if not self._open():
+                return _MISSING
+        elif not self._advance():
+            return _MISSING
+        self.rowcount += 1
+        return self._convert(self._term)
+
+    def fetchone(self):
+        row = self._next_row()
+        return None if row is _MISSING else row
+
+    def fetchmany(self, size=None):
+        rows = []
+        for _ in range(self.arraysize if size is None else size):
+            row = self._next_row()
+            if row is _MISSING:
+                break
+            rows.append(row)
+        return rows
+
+    def fetchall(self):
+        return list(self)
+
+    def close(self):
+        if self.closed:
+            self._closed = True
+            return
+        self._closed = True
+        if self._term is not None:
+            self.eng._close_cursors_above(self)
+            self.eng._cursors.remove(self)
+            self.eng.clear_call()
+
+    def __iter__(self):
+        while True:
+            row = self._next_row()
+            if row is _MISSING:
+                break
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ColumnBuilder:
+    def __init__(self):
+        self.values = array.array("q")
+
+    def append(self, value):
+        values = self.values
+        if type(values) is array.array:
+            try:
+                values.append(value)
+                return
+            except (TypeError, OverflowError):
+                if values.typecode == "q" and type(value) is float:
+                    self.values = values = array.array("d", values)
+                else:
+                    self.values = values = list(values)
+        values.append(value)
+
+    def to_column(self):
+        values = self.values
+        if type(values) is array.array:
+            try:
+                import numpy as np
+            except ImportError:
+                return list(values)
+            return np.frombuffer(values, dtype=np.int64 if values.typecode == "q" else np.float64)
+        return values
+
+
+class HandleTable:
+    index_bits = 24
+
+    def __init__(self, max_size=None, evict=True):
+        self.max_size = max_size
+        self.evict = evict
+        self._index_mask = (1 << self.index_bits) - 1
+        self._generation_mask = (1 << (ffi.sizeof("intptr_t") * 8 - self.index_bits - 1)) - 1
+        self._objects = []
+        self._generations = []
+        self._serials = []
+        self._sizes = []
+        self._free = []
+        self._order = {}
+        self.serial = 0
+        self.bytes = 0
+        self.peak = 0
+        self.evicted = 0
+        self.released = 0
+        self.stale = 0
+
+    def add(self, obj):
+        if self.max_size is not None and len(self._order) >= self.max_size:
+            if not self.evict:
+                raise AmziError("Handle table is full ({} objects)".format(self.max_size))
+            self.remove(next(iter(self._order.values())))
+            self.evicted += 1
+        if self._free:
+            index = self._free.pop()
+        else:
+            index = len(self._objects)
+            if index > self._index_mask - 1:
+                raise AmziError("Handle table is full ({} slots)".format(index))
+            self._objects.append(None)
+            self._generations.append(0)
+            self._serials.append(0)
+            self._sizes.append(0)
+        self.serial += 1
+        size = sys.getsizeof(obj)
+        self._objects[index] = obj
+        self._serials[index] = self.serial
+        self._sizes[index] = size
+        self.bytes += size
+        handle = (self._generations[index] << self.index_bits) | (index + 1)
+        self._order[self.serial] = handle
+        self.peak = max(self.peak, len(self._order))
+        return handle
+
+    def _index(self, handle):
+        index = (handle & self._index_mask) - 1
+        if (0 <= index < len(self._objects) and self._serials[index]
+                and self._generations[index] == handle >> self.index_bits):
+            return index
+        self.stale += 1
+        return -1
+
+    def get(self, handle, default=None):
+        index = self._index(handle)
+        return self._objects[index] if index >= 0 else default
+
+    def remove(self, handle):
+        index = self._index(handle)
+        if index < 0:
+            return False
+        del self._order[self._serials[index]]
+        self.bytes -= self._sizes[index]
+        self._objects[index] = None
+        self._serials[index] = 0
+        self._sizes[index] = 0
+        self._generations[index] = (self._generations[index] + 1) & self._generation_mask
+        self._free.append(index)
+        return True
+
+    def handles_after(self, mark):
+        handles = []
+        for serial in reversed(self._order):
+            if serial <= mark:
+                break
+            handles.append(self._order[serial])
+        return handles
+
+    def release(self, handles):
+        for handle in handles:
+            if self.remove(handle):
+                self.released += 1
+
+    def release_after(self, mark):
+        self.release(self.handles_after(mark))
+
+    def clear(self):
+        self.release_after(0)
+
+    def stats(self):
+        return {
+            "live": len(self._order),
+            "bytes": self.bytes,
+            "peak": self.peak,
+            "slots": len(self._objects),
+            "released": self.released,
+            "evicted": self.evicted,
+            "stale": self.stale,
+        }
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, handle):
+        index = (handle & self._index_mask) - 1
+        return (0 <= index < len(self._objects) and self._serials[index] != 0
+                and self._generations[index] == handle >> self.index_bits)
+
+
 class Engine:
     buffer_size = 65536
+    snapshot_version = 2
+    prepared_cache_size = 256
 
-    def __init__(self, name, load_init=True):
+    def __init__(self, name, load_init=True, max_handles=None):
         self.name = name
         self._eng_id = ffi.new("ENGidptr")
         lib.lsInitW(self._eng_id, name)
-        self._register_lib_functions()
         self._call_stack = []
+        self._cursors = []
+        self._pending_reloads = deque()
+        self._reloading = False
 
         self.buffer = ffi.new("wchar_t[]", self.buffer_size)
         self._wchar_t_cache = {}
-        self._object_cache = set()
+        self._handles = HandleTable(max_handles)
+        self._pending_handles = []
+        self._query_depth = 0
+        self._prepared = {}
+        self._auto_prepared = LRUCache(self.prepared_cache_size, on_evict=lambda template, query: query.close())
+        self._query_id = 0
+        self.owner = None
+        self.output_stream = None
+        self.input_stream = None
+        self._registered_preds = {}
+        self._func_caches = {}
+        self.query_cache = None
+        self._generators = {}
+        self._open_generators = {}
+        self._generator_id = 0
+        self._scope_marks = []
         self.preds_table = {
             "pypredicate": (2, ffi.callback("int(void *)")(self.cb_predicate)),
             "pycall": (3, ffi.callback("int(void *)")(self.cb_pycall3)),
             "pygetobj":  (3, ffi.callback("int(void *)")(self.cb_pygetobj)),
             "pydelobj": (1, ffi.callback("int(void *)")(self.cb_pydelobj)),
+            "pyamzi$gen_open": (3, ffi.callback("int(void *)")(self.cb_gen_open)),
+            "pyamzi$gen_next": (2, ffi.callback("int(void *)")(self.cb_gen_next)),
         }
 
         self.type_map = {
@@ -277,33 +909,35 @@ class Engine:
             lib.pFLOAT: [lib.cDOUBLE, "double *", lambda o: float(o[0])],
             lib.pADDR: [lib.cADDR, "intptr_t *", self._get_pyobject]
         }
+        self._getters = {type_id: self._make_getter(*item) for type_id, item in self.type_map.items()}
+        self._getters[lib.pREAL] = self._get_real
+        self._scratch_term = ffi.new("TERMptr")
+        self._scratch_arity = ffi.new("ARITY *")
         self._preds_table = self.make_preds_table(self.preds_table)
         self.ls_init_preds(self._preds_table)
         if load_init:
-            self.load(find_files("init.xpl")[0])
+            self.load(locate_file("init.xpl"))
 
-    def _register_lib_functions(self):
-        for name in dir(lib):
-            if name.startswith("ls"):
-                self._add_lib_func(name, rc=name in RC_FUNCS)
-
-    def _add_lib_func(self, name, rc=True):
-        func_name = name
-        if func_name.startswith("ls"):
-            func_name = func_name[2:]
-        if func_name.endswith("W"):
-            func_name = func_name[:-1]
-        func_name = "_".join(x.lower() for x in re.split("([A-Z][a-z]+)", func_name) if x)
-        func_name = "ls_" + func_name
+    def __getattr__(self, name):
+        if name.startswith("ls_") and name in lib_functions():
+            lib_name, rc = lib_functions()[name]
+            return self._add_lib_func(lib_name, name, rc)
+        raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+    def _add_lib_func(self, name, func_name, rc=True):
         lib_func = getattr(lib, name)
         id_ = self.ID
-        def func(*args):
-            res = lib_func(id_, *args)
-            if rc and res != 0:
-                error = self.get_error()
-                raise AmziError("Error when call {}({}): {}".format(name, args, error))
-            return res
+        if rc:
+            def func(*args):
+                res = lib_func(id_, *args)
+                if res != 0:
+                    error = self.get_error()
+                    raise AmziError("Error when call {}({}): {}".format(name, args, error))
+                return res
+        else:
+            func = partial(lib_func, id_)
         setattr(self, func_name, func)
+        return func
 
     def get_wchar_array(self, name, cache=False):
         if name not in self._wchar_t_cache:
@@ -337,8 +971,24 @@ class Engine:
             func = obj
         else:
             func = getattr(funcexport, funcname)
-        res = func(*funcargs)
-        return res
+        cache = self._func_caches.get(funcname)
+        if cache is None:
+            cache = getattr(func, "pyamzi_cache", None)
+            if cache is None:
+                return func(*funcargs)
+        return cache.call(func, funcargs)
+
+    def cache_function(self, name, maxsize=128, ttl=None):
+        self._func_caches[name] = cache = LRUCache(maxsize, ttl)
+        return cache
+
+    def invalidate_function_cache(self, name=None):
+        caches = self._func_caches.values() if name is None else [self._func_caches[name]]
+        for cache in caches:
+            cache.invalidate()
+
+    def function_cache_stats(self):
+        return {name: cache.stats() for name, cache in self._func_caches.items()}
 
     def cb_pycall3(self, _):
         try:
@@ -354,25 +1004,154 @@ class Engine:
 
     def cb_pygetobj(self, _):
         obj = self._pycall_help()
-        handle = ffi.new_handle(obj)
         addr = ffi.new("intptr_t *")
-        addr[0] = ffi.cast("intptr_t", handle)
+        addr[0] = self._handles.add(obj)
         res = self.ls_unify_parm(3, lib.cADDR, addr)
-        self._object_cache.add(handle)
         return bool(res)
 
     def cb_pydelobj(self, _):
-        addr = self.get_param_addr(0)
-        handle = ffi.cast("void *", addr)
-        if handle in self._object_cache:
-            self._object_cache.remove(handle)
-            return True
-        else:
-            return False
+        return self._handles.remove(self.get_param_addr(0))
 
     def cb_predicate(self, _):
         return bool(self._pycall_help())
 
+    def cb_gen_open(self, _):
+        try:
+            func, batch_size, _ = self._generators[self.get_parm_term(0).to_object()]
+            args = self.get_parm_term(1).to_object()
+            iterator = iter(func(*args))
+        except Exception:
+            return False
+        self._generator_id += 1
+        self._open_generators[self._generator_id] = (iterator, batch_size)
+        return self.ls_unify_parm(3, lib.cTERM, self.object_to_term(self._generator_id).address)
+
+    def cb_gen_next(self, _):
+        handle = self.get_parm_term(0).to_object()
+        if handle not in self._open_generators:
+            return False
+        iterator, batch_size = self._open_generators[handle]
+        try:
+            batch = list(islice(iterator, batch_size))
+            if len(batch) < batch_size:
+                del self._open_generators[handle]
+            term = self.object_to_term(batch)
+        except Exception:
+            self._open_generators.pop(handle, None)
+            return False
+        return self.ls_unify_parm(2, lib.cTERM, term.address)
+
+    def _release_scope(self, mark, defer=False):
+        generator_mark, handle_mark = mark
+        generators = self._open_generators
+        while generators:
+            handle = next(reversed(generators))
+            if handle <= generator_mark:
+                break
+            del generators[handle]
+        if defer:
+            self._pending_handles.extend(self._handles.handles_after(handle_mark))
+        else:
+            self._handles.release_after(handle_mark)
+
+    def register_generator(self, name, func, arity, batch_size=64):
+        if not self._generators:
+            self.assert_program("""
+            pyamzi$gen_member(H, X):- pyamzi$gen_next(H, Batch), Batch \\= [], pyamzi$gen_member(H, Batch, X).
+            pyamzi$gen_member(_, Batch, X):- member(X, Batch).
+            pyamzi$gen_member(H, _, X):- pyamzi$gen_member(H, X).
+            """)
+        if name not in self._generators:
+            args = ", ".join("A{}".format(i) for i in range(arity - 1))
+            self.ls_assertz_str("{0}({1}{2}X) :- pyamzi$gen_open({0}, [{1}], H), pyamzi$gen_member(H, X)".format(
+                name, args, ", " if args else ""))
+        self._generators[name] = (func, batch_size, arity)
+
+    def _make_parm_reader(self, i, kind):
+        get_parm = lib.lsGetParm
+        eng_id = self.ID
+        if kind is int or kind is float:
+            c_type, value = (lib.cINT, ffi.new("int *")) if kind is int else (lib.cDOUBLE, ffi.new("double *"))
+
+            def reader():
+                if get_parm(eng_id, i, c_type, value) != 0:
+                    raise TypeError("Argument {} is not {}".format(i, kind.__name__))
+                return value[0]
+        elif kind is str:
+            buffer = ffi.new("wchar_t[]", self.buffer_size)
+
+            def reader():
+                if get_parm(eng_id, i, lib.cWSTR, buffer) != 0:
+                    raise TypeError("Argument {} is not str".format(i))
+                return ffi.string(buffer)
+        elif kind is Term or kind is object:
+            convert = self.convert_term
+
+            def reader():
+                term = ffi.new("TERMptr")
+                get_parm(eng_id, i, lib.cTERM, term)
+                return Term(self, term[0]) if kind is Term else convert(term[0])
+        else:
+            raise TypeError("Unsupported argument type: {!r}".format(kind))
+        return reader
+
+    def _make_parm_writer(self, i):
+        unify_parm = lib.lsUnifyParm
+        eng_id = self.ID
+        int_value = ffi.new("int *")
+        double_value = ffi.new("double *")
+
+        def writer(obj):
+            kind = type(obj)
+            if kind is float:
+                double_value[0] = obj
+                return unify_parm(eng_id, i, lib.cDOUBLE, double_value)
+            elif kind is int and obj in _INT_RANGE:
+                int_value[0] = obj
+                return unify_parm(eng_id, i, lib.cINT, int_value)
+            return unify_parm(eng_id, i, lib.cTERM, self.object_to_term(obj).address)
+        return writer
+
+    def register_predicate(self, name, func, arity, signature=None, cache=None):
+        if signature is None:
+            signature = (object,) * (arity - 1)
+        signature = tuple(signature)
+        if len(signature) not in (arity, arity - 1):
+            raise ValueError("signature must have {} or {} types: {!r}".format(arity - 1, arity, signature))
+        readers = [self._make_parm_reader(i + 1, kind) for i, kind in enumerate(signature)]
+        writer = self._make_parm_writer(arity) if len(signature) < arity else None
+
+        if len(readers) == 1:
+            reader = readers[0]
+            read_args = lambda: (reader(), )
+        else:
+            read_args = lambda: [reader() for reader in readers]
+
+        if cache is True:
+            cache = LRUCache()
+        elif cache is None:
+            cache = getattr(func, "pyamzi_cache", None)
+        if cache is not None:
+            self._func_caches["{}/{}".format(name, arity)] = cache
+            call = lambda *args: cache.call(func, args)
+        else:
+            call = func
+
+        def callback(_):
+            try:
+                res = call(*read_args())
+                if writer is None:
+                    return bool(res)
+                if res is None:
+                    return False
+                return writer(res)
+            except Exception:
+                return False
+
+        pred = ffi.callback("int(void *)")(callback)
+        self.ls_add_pred(self.get_wchar_array(name, cache=True), arity, pred, ffi.NULL)
+        self._registered_preds[name, arity] = pred
+
     @property
     def ID(self):
         return self._eng_id[0]
@@ -387,13 +1166,22 @@ class Engine:
         self.ls_set_stream(lib.USER_ERR, 3)
         self.output_stream = output(self)
         self.input_stream = StringInput(self)
+        self._install_drivers()
+
+    def _install_drivers(self):
+        res, _ = self.exec_str("current_predicate('pyamzi$drivers'/0)")
+        if not res:
+            self.exec_str("consult(`{}`)".format(locate_file("drivers.pro").replace("\\", "/")))
 
     def main(self):
         return self.ls_main()
 
     @property
     def cached_object(self):
-        return self._object_cache
+        return self._handles
+
+    def handle_stats(self):
+        return self._handles.stats()
 
     @property
     def output(self):
@@ -403,16 +1191,70 @@ class Engine:
     def output(self, value):
         self.output_stream = value(self)
 
+    @contextmanager
+    def capture(self, max_size=None):
+        previous = self.output_stream
+        output = BufferedOutput(self, max_size=max_size)
+        output.start_query()
+        self.output_stream = output
+        try:
+            yield output
+        finally:
+            output.flush()
+            self.output_stream = previous
+            if previous is not None:
+                previous.attach(self)
+
     @property
     def input(self):
         return self.input_stream
 
+    def enable_query_cache(self, maxsize=1024, scoped=False):
+        self.query_cache = QueryCache(maxsize, scoped)
+        return self.query_cache
+
+    def disable_query_cache(self):
+        self.query_cache = None
+
+    def _db_changed(self, name=None):
+        if self.query_cache is not None:
+            self.query_cache.bump(name)
+
+    def _cached_query(self, func, query, *args, **kw):
+        cache = self.query_cache
+        if DB_UPDATE_PATTERN.search(query):
+            try:
+                return func(query, *args, **kw)
+            finally:
+                self._db_changed()
+        text, names = normalize_query(query)
+        try:
+            key = (func.__name__, text, make_key(args), make_key(kw))
+        except TypeError:
+            return func(query, *args, **kw)
+        res = cache.lookup(key, names, _MISSING)
+        if res is _MISSING:
+            res = func(query, *args, **kw)
+            if contains_term(res):
+                return res
+            cache.store(key, names, res)
+        return copy_result(res)
+
     def consult(self, filename):
         self.exec_str("consult(`{}`)".format(filename))
+        self._db_changed()
+
+    def reconsult(self, filename):
+        self.exec_str("reconsult(`{}`)".format(filename))
+        self._db_changed()
 
     def _assert_help(self, loc, term_str):
+        self._check_owner()
         func = getattr(lib, "lsAssert{}StrW".format(loc))
         res = func(self.ID, term_str)
+        if self.query_cache is not None:
+            match = CLAUSE_HEAD_PATTERN.match(term_str)
+            self._db_changed(match.group(1) if match else None)
         return bool(res)
 
     def assertz(self, term_str):
@@ -427,16 +1269,191 @@ class Engine:
             if clause:
                 self.assertz(clause)
 
+    def load_facts(self, functor, rows=None, columns=None, mode="assertz", batch_size=10000):
+        self._check_owner()
+        if mode not in ("assertz", "asserta", "replace"):
+            raise ValueError("mode must be assertz, asserta or replace: {}".format(mode))
+        if rows is not None and hasattr(rows, "itertuples") and hasattr(rows, "columns"):
+            rows, columns = None, [rows[name].to_numpy() for name in rows.columns]
+        if isinstance(columns, dict):
+            columns = list(columns.values())
+        self._db_changed(functor)
+        if columns is not None:
+            if mode == "replace":
+                self._retract_all(functor, len(columns))
+            batches = self._column_batches(columns, batch_size)
+        else:
+            rows = iter(rows)
+            first = next(rows, _MISSING)
+            if mode == "replace":
+                self._retract_all(functor, None if first is _MISSING else len(first))
+            if first is _MISSING:
+                return 0
+            batches = self._row_batches(chain([first], rows), batch_size)
+
+        if mode == "asserta":
+            batches = [list(reversed(batch)) for batch in reversed(list(batches))]
+        assert_func = lib.lsAsserta if mode == "asserta" else lib.lsAssertz
+
+        eng_id = self.ID
+        functor_w = ffi.new("wchar_t[]", functor)
+        fact = ffi.new("TERMptr")
+        int_cell = ffi.new("int *")
+        double_cell = ffi.new("double *")
+        make_fa = lib.lsMakeFAW
+        unify_arg = lib.lsUnifyArg
+        cINT, cDOUBLE, cWATOM, cWSTR, cTERM = lib.cINT, lib.cDOUBLE, lib.cWATOM, lib.cWSTR, lib.cTERM
+        count = 0
+        for batch in batches:
+            strings = {}
+            for row in batch:
+                arity = len(row)
+                make_fa(eng_id, fact, functor_w, arity)
+                for i, value in enumerate(row, 1):
+                    kind = type(value)
+                    if kind is int and value in _INT_RANGE:
+                        int_cell[0] = value
+                        res = unify_arg(eng_id, fact, i, cINT, int_cell)
+                    elif kind is float:
+                        double_cell[0] = value
+                        res = unify_arg(eng_id, fact, i, cDOUBLE, double_cell)
+                    elif kind is str:
+                        item = strings.get(value)
+                        if item is None:
+                            c_type = cWATOM if ATOM_PATTERN.match(value) is not None else cWSTR
+                            item = strings[value] = (c_type, ffi.new("wchar_t[]", value))
+                        res = unify_arg(eng_id, fact, i, item[0], item[1])
+                    else:
+                        res = unify_arg(eng_id, fact, i, cTERM, self.object_to_term(value).address)
+                    if not res:
+                        raise AmziError("Can't set argument {} of {} to {!r}".format(i, functor, value))
+                if assert_func(eng_id, fact[0]) != 0:
+                    self._raise_error("lsAssert", functor, row)
+                count += 1
+        return count
+
+    def _retract_all(self, functor, arity):
+        if arity is None:
+            self.exec_str("current_predicate({0}/A), functor(H, {0}, A), retractall(H), fail ; true".format(functor))
+            return
+        args = "({})".format(", ".join("_" * arity)) if arity else ""
+        self.exec_str("retractall({}{})".format(functor, args))
+
+    def _row_batches(self, rows, batch_size):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _column_batches(self, columns, batch_size):
+        lengths = {len(column) for column in columns}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        length = lengths.pop() if lengths else 0
+        for start in range(0, length, batch_size):
+            stop = min(start + batch_size, length)
+            batch = [column[start:stop] for column in columns]
+            batch = [column.tolist() if hasattr(column, "tolist") else list(column) for column in batch]
+            yield list(zip(*batch))
+
     def _consult_str_help(self, command, program):
         program += "\nquit.\n"
         self.input.set_text(program)
         self.exec_str(command)
+        self.input.set_text("")
+        self._db_changed()
+
+    def _consult_file_help(self, func, program):
+        fd, filename = tempfile.mkstemp(suffix=".pro", prefix="pyamzi_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(program)
+            func(filename.replace("\\", "/"))
+        finally:
+            os.remove(filename)
+
+    def consult_str(self, program, use_file=True):
+        if use_file:
+            self._consult_file_help(self.consult, program)
+        else:
+            self._consult_str_help("pyamzi:consult_input", program)
+
+    def reconsult_str(self, program, use_file=True):
+        if use_file:
+            self._consult_file_help(self.reconsult, program)
+        else:
+            self._consult_str_help("pyamzi:reconsult_input", program)
 
-    def consult_str(self, program):
-        self._consult_str_help("pyamzi:consult_input", program)
+    def save_snapshot(self, filename):
+        try:
+            acmp = locate_file("acmp.exe")
+        except FileNotFoundError:
+            raise AmziError("Saving a snapshot needs the Amzi compiler acmp.exe")
+        source = os.path.splitext(filename)[0] + ".pro"
+        skip = ", ".join("'{}'/{}".format(name.replace("'", "''"), arity)
+                         for name, (_, _, arity) in self._generators.items())
+        res, _ = self.exec_str("'pyamzi$save_clauses'(`{}`, [{}])".format(source.replace("\\", "/"), skip))
+        if not res:
+            raise AmziError("Can't write snapshot clauses to {}".format(source))
+        compiled = os.path.splitext(source)[0] + ".plm"
+        if subprocess.call([acmp, source]) != 0 or not os.path.exists(compiled):
+            raise AmziError("Can't compile snapshot {}".format(source))
+        info = {
+            "version": self.snapshot_version,
+            "init": file_hash(locate_file("init.xpl")),
+            "source": os.path.basename(source),
+            "compiled": os.path.basename(compiled),
+            "compiled_hash": file_hash(compiled),
+        }
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=1)
+        return info
+
+    def load_snapshot(self, filename):
+        with open(filename, encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("version") != self.snapshot_version:
+            raise AmziError("Unsupported snapshot version {} in {}".format(info.get("version"), filename))
+        if info["init"] != file_hash(locate_file("init.xpl")):
+            raise AmziError("Snapshot {} was saved with a different init.xpl".format(filename))
+        compiled = os.path.join(os.path.dirname(os.path.abspath(filename)), info["compiled"])
+        if not os.path.exists(compiled) or file_hash(compiled) != info["compiled_hash"]:
+            raise AmziError("Snapshot {} is missing or doesn't match its hash".format(compiled))
+        res, _ = self.exec_str("load(`{}`)".format(compiled.replace("\\", "/")))
+        if not res:
+            raise AmziError("Can't load snapshot {}".format(compiled))
+        self._db_changed()
+        return info
 
-    def reconsult_str(self, program):
-        self._consult_str_help("pyamzi:reconsult_input", program)
+    @classmethod
+    def from_snapshot(cls, filename, name=None, **kw):
+        eng = cls(name or str(uuid.uuid1()), load_init=True, **kw)
+        try:
+            eng.load_snapshot(filename)
+        except Exception:
+            eng.close()
+            raise
+        return eng
+
+    def reset(self):
+        for cursor in self._cursors:
+            cursor._closed = True
+        self._cursors = []
+        while self._call_stack:
+            self._clear_call()
+            self._call_stack.pop()
+        self._handles.clear()
+        self._pending_handles = []
+        self._open_generators.clear()
+        self._scope_marks.clear()
+        if self.output_stream is not None:
+            self.output_stream.clear()
+        if self.input_stream is not None:
+            self.input_stream.set_text("")
 
     def close(self):
         self.ls_close()
@@ -452,15 +1469,110 @@ class Engine:
         return self._make_term_object(term_ptr)
 
     def make_term(self, term_str):
+        self._check_owner()
         term = ffi.new("TERMptr")
         self.ls_str_to_term(term, term_str)
         return self._make_term_object(term)
 
+    def _check_owner(self):
+        if self.owner is not None and self.owner != threading.get_ident():
+            raise AmziError("Engine {} is checked out by another thread".format(self.name))
+
+    def schedule_reload(self, filename, detected=None, callback=None):
+        self._pending_reloads.append((filename, detected or time.perf_counter(), callback))
+
+    def apply_reloads(self):
+        if self._reloading or self._query_depth or self._call_stack:
+            return
+        self._reloading = True
+        try:
+            while self._pending_reloads:
+                filename, detected, callback = self._pending_reloads.popleft()
+                self.reconsult(filename)
+                if callback is not None:
+                    callback(self, filename, time.perf_counter() - detected)
+        finally:
+            self._reloading = False
+
     def _call_exec_help(self, funcname, term_str):
+        self._check_owner()
+        if self._pending_reloads:
+            self.apply_reloads()
         term = ffi.new("TERMptr")
-        res = getattr(lib, funcname)(self.ID, term, term_str)
+        output = self.output_stream
+        if output is not None:
+            output.start_query()
+        mark = self._begin_scope()
+        try:
+            res = getattr(lib, funcname)(self.ID, term, term_str)
+        finally:
+            self._query_depth -= 1
+        if output is not None:
+            output.end_query()
+        self._end_scope(funcname, res, mark)
+        if self.query_cache is not None and DB_UPDATE_PATTERN.search(term_str):
+            self._db_changed()
         return bool(res), self._make_term_object(term)
 
+    def _call_exec_term_help(self, funcname, term_ptr):
+        self._check_owner()
+        if self._pending_reloads:
+            self.apply_reloads()
+        output = self.output_stream
+        if output is not None:
+            output.start_query()
+        mark = self._begin_scope()
+        try:
+            res = getattr(lib, funcname)(self.ID, term_ptr)
+        finally:
+            self._query_depth -= 1
+        if output is not None:
+            output.end_query()
+        self._end_scope(funcname, res, mark)
+        return bool(res), self._make_term_object(term_ptr)
+
+    def _begin_scope(self):
+        if self._query_depth == 0 and self._pending_handles:
+            self._handles.release(self._pending_handles)
+            self._pending_handles = []
+        self._query_depth += 1
+        return self._generator_id, self._handles.serial
+
+    def _end_scope(self, funcname, res, mark):
+        if res and funcname.startswith("lsCall"):
+            self._scope_marks.append(mark)
+        else:
+            self._release_scope(mark, defer=True)
+
+    def call_term(self, term_ptr):
+        res, term = self._call_exec_term_help("lsCall", term_ptr)
+        if res:
+            self._call_stack.append(term)
+        return res, term
+
+    def exec_term(self, term_ptr):
+        return self._call_exec_term_help("lsExec", term_ptr)
+
+    def _new_query_id(self):
+        self._query_id += 1
+        return self._query_id
+
+    def prepare(self, template):
+        query = self._prepared.get(template)
+        if query is None or query._closed:
+            query = self._prepared[template] = PreparedQuery(self, template)
+        return query
+
+    def _prepare_auto(self, template):
+        query = self._prepared.get(template)
+        if query is not None and not query._closed:
+            return query
+        query = self._auto_prepared.get(template)
+        if query is None:
+            query = PreparedQuery(self, template)
+            self._auto_prepared.set(template, query)
+        return query
+
     def call_str(self, term_str):
         res, term = self._call_exec_help("lsCallStrW", term_str)
         if res:
@@ -470,7 +1582,41 @@ class Engine:
     def exec_str(self, term_str):
         return self._call_exec_help("lsExecStrW", term_str)
 
-    def query_one(self, query):
+    def _many_help(self, name, goals, convert, chunk_size=None):
+        goals = list(goals)
+        chunk_size = chunk_size or len(goals) or 1
+        results = []
+        for start in range(0, len(goals), chunk_size):
+            goal = ffi.new("TERMptr")
+            self.ls_make_fa(goal, name, 2)
+            self.ls_unify_arg(goal, 1, lib.cTERM, self.list_to_term(goals[start:start + chunk_size]).address)
+            res, term = self.exec_term(goal)
+            if not res:
+                raise AmziError("{} failed".format(name))
+            for item in term.get_arg_term(1).to_object():
+                if isinstance(item, Struct) and item.functor == "true":
+                    results.append(GoalResult(True, convert(item.arguments[0]), None))
+                elif isinstance(item, Struct) and item.functor == "error":
+                    results.append(GoalResult(False, None, item.arguments[0]))
+                else:
+                    results.append(GoalResult(False, None, None))
+        return results
+
+    def exec_many(self, goals, chunk_size=None):
+        return self._many_help("pyamzi$exec_many", goals, lambda term: term, chunk_size)
+
+    def query_one_many(self, queries, chunk_size=None):
+        return self._many_help("pyamzi$query_one_many", queries,
+                               lambda res: dict(zip(res[::2], res[1::2])), chunk_size)
+
+    def query_one(self, query, **kw):
+        if self.query_cache is not None:
+            return self._cached_query(self._query_one, query, **kw)
+        return self._query_one(query, **kw)
+
+    def _query_one(self, query, **kw):
+        if kw:
+            return self._prepare_auto(query).query_one(**kw)
         term_str = "varlist_query(`{}`, L, Z)".format(query)
         res, term = self.exec_str(term_str)
         if not res:
@@ -478,22 +1624,65 @@ class Engine:
         query_res = term.get_arg_term(2).to_object()
         return dict(zip(query_res[::2], query_res[1::2]))
 
-    def query_all(self, query):
+    def cursor(self, query, limit=None, offset=0, **kw):
+        if kw:
+            return self._prepare_auto(query).cursor(limit, offset, **kw)
         term_str = "varlist_query(`{}`, L, Z)".format(query)
-        res, term = self.call_str(term_str)
-        query_term = term.get_arg_term(2)
-        if not res:
+        return Cursor(self, partial(self.call_str, term_str), varlist_bindings, limit, offset)
+
+    def query_columns(self, query, limit=None, dataframe=False, chunk_size=None):
+        _, _, variables = parse_query_template(query)
+        row = "[{}]".format(", ".join(variables))
+        builders = [ColumnBuilder() for _ in variables]
+
+        def fill(rows):
+            for values in rows:
+                for builder, value in zip(builders, values):
+                    builder.append(value)
+
+        if limit is None:
+            fill(chain.from_iterable(self._find_chunks_help(query, row, chunk_size)))
+        else:
+            term_str = "PYAMZI_Row = {}, ({})".format(row, query)
+            with Cursor(self, partial(self.call_str, term_str),
+                        lambda term: term.get_arg_term(0).get_arg_term(1).to_object(), limit) as rows:
+                fill(rows)
+        columns = {name: builder.to_column() for name, builder in zip(variables, builders)}
+        if dataframe:
+            import pandas as pd
+            return pd.DataFrame(columns, columns=variables)
+        return columns
+
+    def _close_cursors_above(self, cursor):
+        while self._cursors and self._cursors[-1] is not cursor:
+            self._cursors[-1].close()
+
+    def query_all(self, query, bulk=False, chunk_size=None, **kw):
+        if kw:
+            yield from self._prepare_auto(query).query_all(**kw)
             return
-        while True:
-            query_res = query_term.to_object()
-            yield dict(zip(query_res[::2], query_res[1::2]))
-            if not self._redo():
-                break
+        if bulk or chunk_size is not None:
+            goal = "varlist_query(`{}`, L, _)".format(query)
+            for chunk in self._find_chunks_help(goal, "L", chunk_size):
+                for query_res in chunk:
+                    yield dict(zip(query_res[::2], query_res[1::2]))
+            return
+        with self.cursor(query) as cursor:
+            yield from cursor
 
     def _redo(self):
-        return bool(self.ls_redo())
+        output = self.output_stream
+        if output is not None:
+            output.resume_query()
+        res = self.ls_redo()
+        if output is not None:
+            output.end_query()
+        if not res and self._scope_marks:
+            self._release_scope(self._scope_marks.pop())
+        return bool(res)
 
     def redo(self):
+        self._check_owner()
         res = self._redo()
         if res:
             return res, self._call_stack[-1]
@@ -502,72 +1691,281 @@ class Engine:
             return res, term
 
     def _clear_call(self):
-        res = self.ls_clear_call()
-        return bool(res)
+        output = self.output_stream
+        if output is not None:
+            output.resume_query()
+        self.ls_clear_call()
+        if output is not None:
+            output.end_query()
+        if self._scope_marks:
+            self._release_scope(self._scope_marks.pop())
+        return True
 
     def clear_call(self):
+        self._check_owner()
         res = self._clear_call()
-        if res:
-            term = self._call_stack.pop()
+        term = self._call_stack.pop() if self._call_stack else None
         return res, term
 
-    def find_all(self, term_str):
-        list_res = []
-        res, term = self.call_str(term_str)
-        if not res or term is None:
+    def find_all(self, term_str, bulk=False, chunk_size=None, as_array=False, dtype=None):
+        if self.query_cache is not None and not as_array:
+            return self._cached_query(self._find_all, term_str, bulk, chunk_size)
+        return self._find_all(term_str, bulk, chunk_size, as_array, dtype)
+
+    def _find_all(self, term_str, bulk=False, chunk_size=None, as_array=False, dtype=None):
+        if as_array:
+            import numpy as np
+            arrays = list(self._find_chunks_help(term_str, None, chunk_size,
+                                                 lambda term: term.to_numpy(dtype)))
+            if not arrays:
+                return np.empty(0, dtype=dtype or np.float64)
+            return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+        if bulk or chunk_size is not None:
+            list_res = []
+            for chunk in self.find_chunks(term_str, chunk_size):
+                list_res.extend(chunk)
             return list_res
-        list_res.append(term.to_object())
-        while self._redo():
-            list_res.append(term.to_object())
-        return list_res
+        with Cursor(self, partial(self.call_str, term_str), Term.to_object) as cursor:
+            return cursor.fetchall()
 
-    def _make_term_object(self, term):
-        return Term(self, term) if term[0] != ffi.NULL else None
+    def find_chunks(self, term_str, chunk_size=None):
+        return self._find_chunks_help(term_str, None, chunk_size)
 
-    def _get_pyobject(self, addr):
-        handle = ffi.cast("void *", addr[0])
-        if handle in self._object_cache:
-            return ffi.from_handle(handle)
-        else:
-            return None
+    def _find_chunks_help(self, goal, template=None, chunk_size=None, convert=Term.to_object):
+        goal = "({})".format(goal)
+        template = goal if template is None else "({})".format(template)
 
-    def term_to_object(self, term):
-        type_id = term.type_id
+        if chunk_size is None:
+            res, term = self.exec_str("findall({}, {}, PYAMZI_Result)".format(template, goal))
+            if not res:
+                raise AmziError("findall failed: {}".format(goal))
+            yield convert(term.get_arg_term(2))
+            return
 
-        if term.is_list:
-            head = term.head
-            if head is None:
-                return []
-            list_res = []
-            while True:
-                list_res.append(term.head.to_object())
-                term = term.tail
-                if term is None:
-                    break
-            return list_res
+        chunk_size = int(chunk_size)
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive: {}".format(chunk_size))
+        call = "'pyamzi$find_chunks'({}, {}, {}, PYAMZI_Chunk)".format(template, goal, chunk_size)
+        with Cursor(self, partial(self.call_str, call), lambda term: convert(term.get_arg_term(3))) as cursor:
+            yield from cursor
 
-        elif term.is_struct:
-            return Struct(term.functor, term.arguments)
+    def _make_term_object(self, term):
+        return Term(self, term[0]) if term[0] != ffi.NULL else None
 
-        elif term.is_var:
-            return term
+    def _get_pyobject(self, addr):
+        return self._handles.get(addr[0])
 
-        if type_id in self.type_map:
-            c_type, ffi_type, cast_func = self.type_map[type_id]
-            self.ls_get_term(term.ID, c_type, self.buffer)
-            ffi_obj = ffi.cast(ffi_type, self.buffer)
+    def _make_getter(self, c_type, ffi_type, cast_func):
+        get_term = lib.lsGetTerm
+        eng_id = self.ID
+        buffer = self.buffer
+        ffi_obj = ffi.cast(ffi_type, buffer)
+
+        def getter(term_id):
+            if get_term(eng_id, term_id, c_type, buffer) != 0:
+                raise AmziError("Error when call lsGetTerm: {}".format(self.get_error()))
             return cast_func(ffi_obj)
+        return getter
+
+    def _get_real(self, term_id):
+        if lib.lsTermToStrW(self.ID, term_id, self.buffer, self.buffer_size) != 0:
+            raise AmziError("Error when call lsTermToStrW: {}".format(self.get_error()))
+        return convert_real(ffi.string(self.buffer))
+
+    def term_to_object(self, term):
+        return self.convert_term(term.ID)
+
+    def convert_term(self, term_id):
+        eng_id = self.ID
+        get_type = lib.lsGetTermType
+        get_head = lib.lsGetHead
+        get_tail = lib.lsGetTail
+        get_arg = lib.lsGetArg
+        get_fa = lib.lsGetFAW
+        getters = self._getters
+        cell = self._scratch_term
+        arity_cell = self._scratch_arity
+        buffer = self.buffer
+        NULL = ffi.NULL
+        pLIST, pSTRUCT, pVAR, cTERM = lib.pLIST, lib.pSTRUCT, lib.pVAR, lib.cTERM
+        use_accel = accel.available()
+
+        result = [None]
+        stack = [(term_id, get_type(eng_id, term_id), result, 0)]
+        structs = []
+        while stack:
+            term_id, type_id, parent, index = stack.pop()
+            getter = getters.get(type_id)
+            if getter is not None:
+                parent[index] = getter(term_id)
+            elif type_id == pLIST:
+                fast_items = accel.list_items(eng_id, term_id) if use_accel else None
+                if fast_items is not None:
+                    items = [None] * len(fast_items)
+                    parent[index] = items
+                    self._fill_accel_items(fast_items, items, stack)
+                    continue
+                items = []
+                parent[index] = items
+                while term_id != NULL:
+                    get_head(eng_id, term_id, cTERM, cell)
+                    head = cell[0]
+                    head_type = get_type(eng_id, head)
+                    getter = getters.get(head_type)
+                    if getter is not None:
+                        items.append(getter(head))
+                    else:
+                        stack.append((head, head_type, items, len(items)))
+                        items.append(None)
+                    term_id = get_tail(eng_id, term_id)
+            elif type_id == pSTRUCT:
+                get_fa(eng_id, term_id, buffer, arity_cell)
+                arity = int(arity_cell[0])
+                args = [None] * arity
+                structs.append((parent, index, ffi.string(buffer), args))
+                fast_items = accel.struct_items(eng_id, term_id, arity) if use_accel else None
+                if fast_items is not None:
+                    self._fill_accel_items(fast_items, args, stack)
+                    continue
+                for i in range(arity):
+                    get_arg(eng_id, term_id, i + 1, cTERM, cell)
+                    arg = cell[0]
+                    if arg == NULL:
+                        continue
+                    stack.append((arg, get_type(eng_id, arg), args, i))
+            elif type_id == pVAR:
+                parent[index] = Term(self, term_id)
+            else:
+                raise ValueError("Unknown Term type: {}".format(type_id))
+
+        for parent, index, functor, args in reversed(structs):
+            parent[index] = Struct(functor, tuple(args))
+        return result[0]
+
+    def _fill_accel_items(self, fast_items, out, stack):
+        getters = self._getters
+        pINT, pFLOAT = lib.pINT, lib.pFLOAT
+        for i, item in enumerate(fast_items):
+            type_id = item.type
+            if type_id == pINT:
+                out[i] = item.ival
+            elif type_id == pFLOAT:
+                out[i] = item.fval
+            else:
+                getter = getters.get(type_id)
+                if getter is not None:
+                    out[i] = getter(item.term)
+                else:
+                    stack.append((item.term, type_id, out, i))
+
+    def _numpy_shape(self, term_id):
+        eng_id = self.ID
+        cell = self._scratch_term
+        shape = []
+        while True:
+            type_id = lib.lsGetTermType(eng_id, term_id)
+            if type_id == lib.pLIST:
+                length = 0
+                head = None
+                while term_id != ffi.NULL:
+                    if head is None:
+                        lib.lsGetHead(eng_id, term_id, lib.cTERM, cell)
+                        head = cell[0]
+                    length += 1
+                    term_id = lib.lsGetTail(eng_id, term_id)
+                shape.append(length)
+                term_id = head
+            elif type_id == lib.pSTRUCT:
+                lib.lsGetFAW(eng_id, term_id, self.buffer, self._scratch_arity)
+                shape.append(int(self._scratch_arity[0]))
+                lib.lsGetArg(eng_id, term_id, 1, lib.cTERM, cell)
+                term_id = cell[0]
+            elif type_id == lib.pATOM and not shape and self._getters[type_id](term_id) == []:
+                return [0], None
+            else:
+                return shape, type_id
+
+    def term_to_numpy(self, term_id, dtype=None):
+        import numpy as np
+        shape, leaf_type = self._numpy_shape(term_id)
+        if not shape:
+            raise TypeError("Only lists and structures can be converted to numpy array")
+        if dtype is None:
+            if leaf_type == lib.pINT:
+                dtype = np.int64
+            elif leaf_type in (lib.pFLOAT, None):
+                dtype = np.float64
+            else:
+                raise TypeError("Can't convert Term type {} to numpy array".format(leaf_type))
+        dtype = np.dtype(dtype)
+        if dtype.kind == "f":
+            c_type, buf_type, ptr_type = lib.cDOUBLE, np.double, "double *"
+        elif dtype.kind in "iub":
+            c_type, buf_type, ptr_type = lib.cINT, np.intc, "int *"
         else:
-            raise ValueError("Unknown Term type: {}".format(type_id))
+            raise TypeError("Unsupported dtype: {}".format(dtype))
+
+        arr = np.empty(shape, dtype=buf_type)
+        if arr.size == 0:
+            return arr.astype(dtype, copy=False)
+        out = ffi.cast(ptr_type, ffi.from_buffer(arr))
+        strides = [int(np.prod(shape[i + 1:])) for i in range(len(shape))]
+
+        eng_id = self.ID
+        cell = self._scratch_term
+        get_type = lib.lsGetTermType
+        get_head = lib.lsGetHead
+        get_tail = lib.lsGetTail
+        get_arg = lib.lsGetArg
+        get_term = lib.lsGetTerm
+        pLIST, cTERM = lib.pLIST, lib.cTERM
+        last = len(shape) - 1
+
+        def items(term_id, depth):
+            if get_type(eng_id, term_id) == pLIST:
+                count = 0
+                while term_id != ffi.NULL:
+                    if count == shape[depth]:
+                        break
+                    get_head(eng_id, term_id, cTERM, cell)
+                    yield cell[0]
+                    count += 1
+                    term_id = get_tail(eng_id, term_id)
+                if count != shape[depth] or term_id != ffi.NULL:
+                    raise ValueError("Nested lists must have equal length: {}".format(shape))
+            elif get_type(eng_id, term_id) == lib.pSTRUCT:
+                lib.lsGetFAW(eng_id, term_id, self.buffer, self._scratch_arity)
+                if self._scratch_arity[0] != shape[depth]:
+                    raise ValueError("Structures must have equal arity: {}".format(shape))
+                for i in range(shape[depth]):
+                    get_arg(eng_id, term_id, i + 1, cTERM, cell)
+                    yield cell[0]
+            else:
+                raise ValueError("Nested lists must have equal depth: {}".format(shape))
+
+        def fill(term_id, offset, depth):
+            stride = strides[depth]
+            for i, item in enumerate(items(term_id, depth)):
+                if depth == last:
+                    if get_term(eng_id, item, c_type, out + offset + i) != 0:
+                        raise TypeError("Can't convert {} to {}".format(Term(self, item), dtype))
+                else:
+                    fill(item, offset + i * stride, depth + 1)
+
+        fill(term_id, 0, 0)
+        return arr.astype(dtype, copy=False)
 
     def object_to_term(self, obj):
+        self._check_owner()
         if isinstance(obj, str):
             term = ffi.new("TERMptr")
-            func = self.ls_make_atom if re.match(r"^\w+$", obj) is not None else self.ls_make_str
+            func = self.ls_make_atom if ATOM_PATTERN.match(obj) is not None else self.ls_make_str
             wchar_obj = self.get_wchar_array(obj)
             res = func(term, wchar_obj)
             return self._make_term_object(term)
         elif isinstance(obj, int):
+            if obj not in _INT_RANGE:
+                return self.make_term(str(obj))
             term = ffi.new("TERMptr")
             self.ls_make_int(term, obj)
             return self._make_term_object(term)
@@ -576,12 +1974,7 @@ class Engine:
             self.ls_make_float(term, obj)
             return self._make_term_object(term)
         elif isinstance(obj, list):
-            list_term = ffi.new("TERMptr")
-            self.ls_make_list(list_term)
-            for element in reversed(obj):
-                element_term = self.object_to_term(element)
-                self.ls_push_list(list_term, element_term.ID)
-            return self._make_term_object(list_term)
+            return self.list_to_term(obj)
         elif isinstance(obj, Struct):
             struct_term = ffi.new("TERMptr")
             functor = self.get_wchar_array(obj.functor)
@@ -590,6 +1983,59 @@ class Engine:
                 arg_term = self.object_to_term(arg_obj)
                 self.ls_unify_arg(struct_term, i, lib.cTERM, arg_term.address)
             return self._make_term_object(struct_term)
+        elif isinstance(obj, (tuple, array.array)):
+            return self.list_to_term(obj)
+        elif isinstance(obj, dict):
+            return self.list_to_term([Struct("-", item) for item in obj.items()])
+        elif hasattr(obj, "ndim") and hasattr(obj, "tolist"):
+            return self.object_to_term(obj.tolist())
+        elif isinstance(obj, Iterable) and not isinstance(obj, (bytes, bytearray)):
+            return self.list_to_term(obj)
+        raise TypeError("Can't convert {} to Term".format(type(obj).__name__))
+
+    def list_to_term(self, values):
+        if hasattr(values, "tolist"):
+            values = values.tolist()
+        elif not isinstance(values, (list, tuple)):
+            values = list(values)
+
+        eng_id = self.ID
+        push_list = lib.lsPushList
+        list_term = ffi.new("TERMptr")
+        self.ls_make_list(list_term)
+        if not values:
+            return self._make_term_object(list_term)
+
+        cell = self._scratch_term
+        kind = type(values[0])
+        if (kind not in (int, float, str) or any(type(value) is not kind for value in values)
+                or kind is int and not all(value in _INT_RANGE for value in values)):
+            for value in reversed(values):
+                push_list(eng_id, list_term, self.object_to_term(value).ID)
+        elif kind is str:
+            make_atom, make_str = lib.lsMakeAtomW, lib.lsMakeStrW
+            terms = {}
+            for value in reversed(values):
+                term_id = terms.get(value)
+                if term_id is None:
+                    make = make_atom if ATOM_PATTERN.match(value) is not None else make_str
+                    if make(eng_id, cell, ffi.new("wchar_t[]", value)) != 0:
+                        self._raise_error("lsMakeAtomW", value)
+                    term_id = terms[value] = cell[0]
+                if push_list(eng_id, list_term, term_id) != 0:
+                    self._raise_error("lsPushList", value)
+        elif accel.available():
+            if not accel.make_number_list(eng_id, list_term, values, kind):
+                self._raise_error("pyamzi_make_list", kind.__name__)
+        else:
+            make = lib.lsMakeInt if kind is int else lib.lsMakeFloat
+            for value in reversed(values):
+                if make(eng_id, cell, value) != 0 or push_list(eng_id, list_term, cell[0]) != 0:
+                    self._raise_error("lsPushList", value)
+        return self._make_term_object(list_term)
+
+    def _raise_error(self, name, *args):
+        raise AmziError("Error when call {}({}): {}".format(name, args, self.get_error()))
 
     def get_error(self):
         self.ls_get_except_msg(self.buffer, self.buffer_size)
@@ -1,7 +1,9 @@
+import sys
 import pytest
 import uuid
-from .pyamzi import Engine, Struct, StringOutput
-from .utils import find_files
+from .pyamzi import Engine, AmziError, Struct, Term, HandleTable, StringOutput, BufferedOutput, FileSink
+from .utils import find_files, locate_file
+from .cache import memoize, LRUCache
 
 @pytest.fixture(scope='function')
 def eng(request):
@@ -29,6 +31,49 @@ def test_terms(eng):
     assert term_list.to_object() == Struct("hello", ("world", 123))
 
 
+def test_term_to_object_nested(eng):
+    text = "[1, f(a, [b, g(2.5)], X), []]"
+    obj = eng.make_term(text).to_object()
+    assert obj[:1] == [1] and obj[2] == []
+    assert obj[1].functor == "f"
+    assert obj[1].arguments[:2] == ("a", ["b", Struct("g", (2.5,))])
+    assert obj[1].arguments[2].is_var
+    depth = 5000
+    term = eng.make_term("[" * depth + "x" + "]" * depth)
+    obj = term.to_object()
+    for _ in range(depth):
+        obj, = obj
+    assert obj == "x"
+    res, term = eng.exec_str("findall(X, (X = 1 ; X = 2 ; X = c), L)")
+    assert term.get_arg_term(2).to_object() == [1, 2, "c"]
+
+
+def test_to_numpy(eng):
+    np = pytest.importorskip("numpy")
+    arr = eng.make_term("[1, 2, 3]").to_numpy()
+    assert arr.dtype == np.int64
+    assert arr.tolist() == [1, 2, 3]
+    arr = eng.make_term("[[1.5, 2.0], [3.0, 4.0]]").to_numpy()
+    assert arr.dtype == np.float64
+    assert arr.tolist() == [[1.5, 2.0], [3.0, 4.0]]
+    assert eng.make_term("[1, 2]").to_numpy(dtype=np.float32).dtype == np.float32
+    assert eng.make_term("[]").to_numpy().shape == (0,)
+    with pytest.raises(ValueError):
+        eng.make_term("[[1, 2], [3]]").to_numpy()
+
+    eng.reconsult_str("""
+    point(1, 2).
+    point(3, 4).
+    point(5, 6).
+    """)
+    arr = eng.find_all("point(X, Y)", as_array=True)
+    assert arr.tolist() == [[1, 2], [3, 4], [5, 6]]
+    arr = eng.find_all("point(X, Y)", as_array=True, chunk_size=2)
+    assert arr.tolist() == [[1, 2], [3, 4], [5, 6]]
+    assert eng.find_all("point(7, Y)", as_array=True).shape == (0,)
+    assert eng.find_all("point(7, Y)", as_array=True, chunk_size=2).shape == (0,)
+
+
 def test_find_all(eng):
     eng.reconsult_str("""
     test(x, y).
@@ -47,6 +92,74 @@ def test_find_all(eng):
     assert len(res) == 0
 
 
+def test_find_all_bulk(eng):
+    eng.reconsult_str("""
+    test(x, y).
+    test(x, z).
+    test(t, x).
+    """)
+    expected = eng.find_all("test(X, Y)")
+    assert eng.find_all("test(X, Y)", bulk=True) == expected
+    assert eng.find_all("test(X, Y)", chunk_size=2) == expected
+    assert list(eng.find_chunks("test(X, Y)", 2)) == [expected[:2], expected[2:]]
+    assert eng.find_all("test(a, b)", bulk=True) == []
+    assert list(eng.query_all("test(x, Y)", chunk_size=1)) == [{"Y":"y"}, {"Y":"z"}]
+
+
+def test_cursor(eng):
+    eng.reconsult_str("""
+    num(1). num(2). num(3). num(4). num(5).
+    """)
+    with eng.cursor("num(X)", limit=3, offset=1) as cursor:
+        assert cursor.fetchone() == {"X": 2}
+        assert cursor.fetchmany(5) == [{"X": 3}, {"X": 4}]
+        assert cursor.fetchone() is None
+    assert not eng._call_stack
+
+    outer = eng.cursor("num(X)")
+    inner = eng.cursor("num(Y)")
+    assert outer.fetchone() == {"X": 1}
+    assert inner.fetchone() == {"Y": 1}
+    assert outer.fetchone() == {"X": 2}
+    assert inner.closed
+    outer.close()
+    assert not eng._call_stack
+
+    for row in eng.query_all("num(X)"):
+        break
+    assert [r["X"] for r in eng.query_all("num(X)")] == [1, 2, 3, 4, 5]
+    assert not eng._call_stack
+
+
+def test_query_columns(eng):
+    eng.reconsult_str("""
+    item(a, 1, 0.5).
+    item(b, 2, 1).
+    item(c, 3, 1.5).
+    """)
+    columns = eng.query_columns("item(Name, N, W)")
+    assert list(columns) == ["Name", "N", "W"]
+    assert columns["Name"] == ["a", "b", "c"]
+    assert list(columns["N"]) == [1, 2, 3]
+    assert list(columns["W"]) == [0.5, 1.0, 1.5]
+    assert list(eng.query_columns("item(Name, N, _)", limit=2)["N"]) == [1, 2]
+    assert list(eng.query_columns("item(Name, N, _)", chunk_size=2)["N"]) == [1, 2, 3]
+    assert list(eng.query_columns("item(d, N, _)")["N"]) == []
+
+
+def test_exec_many(eng):
+    eng.reconsult_str("""
+    double(X, Y):- Y is X * 2.
+    """)
+    results = eng.exec_many(["double(2, Y)", "fail", "foo(", "true"])
+    assert results[0].success and results[0].result == Struct("double", (2, 4))
+    assert not results[1].success and results[1].error is None
+    assert not results[2].success and results[2].error is not None
+    assert results[3].success
+    results = eng.query_one_many(["double({}, Y)".format(i) for i in range(5)], chunk_size=2)
+    assert [r.result for r in results] == [{"Y": i * 2} for i in range(5)]
+
+
 def test_pyfunc(eng):
     from math import sin, cos
     eng.reconsult_str("""
@@ -66,6 +179,105 @@ def test_pyfunc(eng):
     assert abs(C - s - c) < 1e-6
 
 
+def test_register_predicate(eng):
+    from math import sin
+    eng.register_predicate("py_sin", sin, 2, signature=(float,))
+    eng.register_predicate("py_even", lambda x: x % 2 == 0, 1, signature=(int,))
+    eng.register_predicate("py_join", lambda items: "-".join(items), 2)
+    assert abs(eng.query_one("py_sin(1.0, X)")["X"] - sin(1)) < 1e-6
+    assert eng.find_all("member(X, [1, 2, 3, 4]), py_even(X)") == [2, 4]
+    assert eng.query_one("py_join([a, b], X)")["X"] == "a-b"
+    eng.register_predicate("py_object", lambda x: object(), 2)
+    assert eng.query_one("py_object(1, X)") is None
+
+
+def test_register_generator(eng):
+    eng.register_generator("py_range", range, 3, batch_size=4)
+    assert [r["X"] for r in eng.query_all("py_range(0, 10, X)")] == list(range(10))
+    assert eng.query_one("py_range(0, 1000, X), X > 10") == {"X": 11}
+    res = eng.query_all("py_range(0, 3, X), py_range(X, 3, Y)", bulk=True)
+    assert [(r["X"], r["Y"]) for r in res] == [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]
+    assert not eng._open_generators
+
+
+def test_memoize():
+    calls = []
+
+    @memoize(maxsize=2)
+    def score(a, b):
+        calls.append((a, b))
+        return len(a) + b
+
+    cache = score.pyamzi_cache
+    assert cache.call(score, (["x", Struct("f", (1, ))], 1)) == 3
+    assert cache.call(score, (["x", Struct("f", (1, ))], 1)) == 3
+    assert len(calls) == 1
+    cache.call(score, ([], 1))
+    cache.call(score, ([], 2))
+    assert cache.stats()["evictions"] == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_lru_cache_threads():
+    import threading
+    evicted = []
+    cache = LRUCache(maxsize=16, on_evict=lambda key, value: evicted.append(key))
+
+    def worker(offset):
+        for i in range(2000):
+            key = (offset + i) % 64
+            if cache.get(key) is None:
+                cache.set(key, key)
+            if i % 100 == 0:
+                cache.invalidate(key)
+
+    threads = [threading.Thread(target=worker, args=(n * 7, )) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert stats["size"] <= 16
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+    assert stats["evictions"] == len(evicted)
+
+
+def test_function_cache(eng):
+    eng.cache_function("sin")
+    eng.reconsult_str("""
+    run_sin(Y):- pycall(sin, 1, Y), pycall(sin, 1, Y).
+    """)
+    assert eng.query_one("run_sin(Y)")
+    stats = eng.function_cache_stats()["sin"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_query_cache(eng):
+    cache = eng.enable_query_cache(scoped=True)
+    cache.add_dependency("adult", "age")
+    eng.assert_program("""
+    age(tom, 30).
+    city(tom, paris).
+    adult(X):- age(X, A), A >= 18.
+    """)
+    assert eng.find_all("adult(X)") == [Struct("adult", ("tom", ))]
+    assert eng.find_all(" adult( X )") == [Struct("adult", ("tom", ))]
+    assert eng.query_one("city(tom, C)") == {"C": "paris"}
+    assert cache.stats()["hits"] == 1
+    eng.assertz("age(ann, 20)")
+    assert len(eng.find_all("adult(X)")) == 2
+    assert eng.query_one("city(tom, C)") == {"C": "paris"}
+    assert cache.stats()["hits"] == 2
+    assert eng.query_one("retract(age(ann, _))")
+    assert len(eng.find_all("adult(X)")) == 1
+    eng.exec_str("retract(age(tom, _))")
+    assert eng.find_all("adult(X)") == []
+    size = cache.stats()["size"]
+    assert isinstance(eng.query_one("X = f(Y)")["X"].arguments[0], Term)
+    assert cache.stats()["size"] == size
+
+
 def test_pyiter(eng):
     eng.output = StringOutput
     eng.reconsult_str("""
@@ -90,6 +302,42 @@ def test_pyiter(eng):
     assert len(eng.cached_object) == 1
 
 
+def test_handle_table():
+    table = HandleTable(max_size=2)
+    a, b = table.add("a"), table.add("b")
+    assert table.get(a) == "a" and b in table
+    assert table.remove(a)
+    c = table.add("c")
+    assert table.get(a) is None and table.get(c) == "c"
+    table.add("d")
+    assert b not in table and len(table) == 2
+    assert table.stats()["evicted"] == 1
+
+
+def test_handle_scope(eng):
+    eng.reconsult_str("""
+    get_iter(E):- pygetobj(iter, [[1, 2]], E).
+    """)
+    res, term = eng.exec_str("get_iter(E)")
+    assert list(term.arguments[0]) == [1, 2]
+    eng.exec_str("true")
+    assert len(eng.cached_object) == 0
+    assert eng.query_one("get_iter(E), fail") is None
+    assert eng.handle_stats()["live"] == 0
+
+
+def test_lazy_term(eng):
+    res, term = eng.exec_str("X = f([1, 2, 3, g(a, [])], `s`)")
+    args = term.get_arg_term(1).lazy()
+    assert args.functor == "f" and len(args) == 2
+    assert args[-1] == "s"
+    items = args.term.get_arg_term(0).lazy()
+    assert items[1] == 2 and items[:2] == [1, 2]
+    assert len(items) == 4
+    assert items[3] == Struct("g", ("a", []))
+    assert list(items) == [1, 2, 3, Struct("g", ("a", []))]
+
+
 def test_object_to_term(eng):
     term = eng.object_to_term("hello")
     assert term.is_atom
@@ -125,6 +373,47 @@ def test_object_to_term(eng):
     assert term.to_object() == astruct
 
 
+def test_object_to_term_bulk(eng):
+    import array
+    assert eng.object_to_term([1.5, 2.5]).to_object() == [1.5, 2.5]
+    assert eng.object_to_term(["a", "b c", "a"]).to_object() == ["a", "b c", "a"]
+    assert eng.object_to_term((1, "x")).to_object() == [1, "x"]
+    assert eng.object_to_term(array.array("i", [4, 5])).to_object() == [4, 5]
+    assert eng.object_to_term({"k": 1}).to_object() == [Struct("-", ("k", 1))]
+    assert eng.object_to_term(x for x in range(3)).to_object() == [0, 1, 2]
+    assert eng.object_to_term(range(2, 5)).to_object() == [2, 3, 4]
+    assert eng.object_to_term([range(2), iter("ab")]).to_object() == [[0, 1], ["a", "b"]]
+    with pytest.raises(TypeError):
+        eng.object_to_term(b"bytes")
+    np = pytest.importorskip("numpy")
+    assert eng.object_to_term(np.arange(4)).to_object() == [0, 1, 2, 3]
+    arr = np.arange(6.0).reshape(2, 3)
+    assert eng.object_to_term(arr).to_object() == arr.tolist()
+
+
+def test_load_facts(eng):
+    rows = [(1, 2.5, "a"), (2, 3.5, "b c"), (3, 4.5, "a")]
+    assert eng.load_facts("fact", rows, batch_size=2) == 3
+    assert eng.find_all("fact(X, Y, Z)") == [Struct("fact", row) for row in rows]
+    eng.load_facts("fact", [(0, 0.5, "z")], mode="asserta")
+    assert eng.find_all("fact(X, Y, Z)")[0] == Struct("fact", (0, 0.5, "z"))
+    eng.load_facts("fact", columns={"x": [7, 8], "y": [1.0, 2.0], "z": ["p", "q"]}, mode="replace")
+    assert eng.find_all("fact(X, Y, Z)") == [Struct("fact", (7, 1.0, "p")), Struct("fact", (8, 2.0, "q"))]
+    assert eng.load_facts("fact", [], mode="replace") == 0
+    assert eng.find_all("fact(X, Y, Z)") == []
+    eng.load_facts("fact", [(1, 2.5, "a")])
+    assert eng.load_facts("fact", columns={"x": [], "y": [], "z": []}, mode="replace") == 0
+    assert eng.find_all("fact(X, Y, Z)") == []
+    eng.load_facts("big", [(2 ** 40, 1), (-2 ** 63, 2)])
+    assert eng.query_one("big(X, 1), X > 2147483647") == {"X": 2 ** 40}
+    assert eng.find_all("big(X, Y)") == [Struct("big", (2 ** 40, 1)), Struct("big", (-2 ** 63, 2))]
+    assert eng.query_one("X = {x}, Y is X + 1", x=2 ** 40) == {"X": 2 ** 40, "Y": 2 ** 40 + 1}
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"x": [1, 2], "y": ["u", "v"]})
+    eng.load_facts("pair", df)
+    assert eng.find_all("pair(X, Y)") == [Struct("pair", (1, "u")), Struct("pair", (2, "v"))]
+
+
 def test_reconsult_str(eng):
     eng.output = StringOutput
     test_code = """
@@ -145,12 +434,155 @@ def test_reconsult_str(eng):
     assert output == "b1.0 (2.0),finished"
 
 
+def test_consult_str_stream(eng):
+    test_code = """
+    test(a, `x y`).
+    test(b, 1.5).
+    """
+    eng.reconsult_str(test_code, use_file=False)
+    assert eng.find_all("test(X, Y)") == [Struct("test", ("a", "x y")), Struct("test", ("b", 1.5))]
+    eng.reconsult_str("test(c, 2).")
+    assert eng.find_all("test(X, Y)") == [Struct("test", ("c", 2))]
+    eng.consult_str("other(1).", use_file=False)
+    assert eng.find_all("other(X)") == [Struct("other", (1,))]
+
+
+def test_buffered_output(eng, tmpdir):
+    from functools import partial
+    eng.output = partial(BufferedOutput, block_size=4, max_size=5)
+    eng.exec_str("write(hello), write(` world`)")
+    assert eng.output.get_value() == "world"
+    assert eng.output.query_bytes == 11
+
+    with eng.capture() as out:
+        eng.exec_str("write(captured)")
+    assert out.get_value() == "captured"
+    assert eng.output.get_value() == "world"
+    with eng.capture() as out2:
+        eng.exec_str("write(again)")
+    assert out.get_value() == "captured"
+    assert out2.get_value() == "again"
+
+    filename = str(tmpdir.join("out.txt"))
+    sink = FileSink(filename)
+    eng.output = partial(BufferedOutput, sink=sink)
+    eng.exec_str("write(a), nl, write(b), nl")
+    sink.close()
+    with open(filename) as f:
+        assert f.read() == "a\nb\n"
+
+
+def test_buffered_output_interleaved(eng):
+    other = Engine(str(uuid.uuid1()), load_init=True)
+    try:
+        for e in (eng, other):
+            e.reconsult_str("say(X):- member(X, [1, 2]), write(X).")
+            e.output = BufferedOutput
+        with eng.cursor("say(X)") as first, other.cursor("say(X)") as second:
+            for _ in range(2):
+                first.fetchone()
+                second.fetchone()
+        assert eng.output.get_value() == "12"
+        assert other.output.get_value() == "12"
+    finally:
+        other.close()
+
+
+def test_locate_file(monkeypatch, tmpdir):
+    from .utils import locate_file
+    locate_file.cache_clear()
+    monkeypatch.setenv("PYAMZI_INIT", "/opt/init.xpl")
+    assert locate_file("init.xpl") == "/opt/init.xpl"
+    locate_file.cache_clear()
+    monkeypatch.delenv("PYAMZI_INIT")
+    monkeypatch.setenv("PYAMZI_HOME", str(tmpdir))
+    tmpdir.mkdir("apls").mkdir("bin").join("acmp.exe").write("")
+    assert locate_file("acmp.exe") == str(tmpdir.join("apls", "bin", "acmp.exe"))
+    with pytest.raises(FileNotFoundError):
+        locate_file("alnk.exe")
+    locate_file.cache_clear()
+
+
 def test_builder():
     from .builder import cmp_path, lnk_path
     assert cmp_path.endswith(".exe")
     assert lnk_path.endswith(".exe")
 
 
+@pytest.mark.skipif(sys.platform == "win32", reason="stand-in tools are POSIX scripts")
+def test_incremental_build(tmpdir):
+    import os
+    from .builder import Builder
+    tools = tmpdir.mkdir("tools")
+    log = tools.join("log")
+    compiler = tools.join("acmp")
+    compiler.write("#!{}\nimport sys, shutil\nopen({!r}, 'a').write(sys.argv[1] + '\\n')\n"
+                   "shutil.copy(sys.argv[1], sys.argv[1][:-4] + '.plm')\n".format(sys.executable, str(log)))
+    linker = tools.join("alnk")
+    linker.write("#!{}\nimport sys\nopen({!r}, 'a').write('link\\n')\n"
+                 "open(sys.argv[1], 'w').write(''.join(open(fn).read() for fn in sys.argv[2:]))\n".format(
+                     sys.executable, str(log)))
+    os.chmod(str(compiler), 0o755)
+    os.chmod(str(linker), 0o755)
+    src = tmpdir.mkdir("prog")
+    src.join("a.pro").write("a.")
+    src.join("b.pro").write("b.")
+
+    builder = Builder(str(src), cmp_path=str(compiler), lnk_path=str(linker))
+    assert builder.load() == str(src.join("prog.xpl"))
+    assert sorted(builder.timings) == ["a.pro", "b.pro", "link", "total"]
+    assert src.join("prog.xpl").read() == "a.b."
+
+    log.write("")
+    builder.build()
+    assert log.read() == ""
+
+    src.join("b.pro").write("b2.")
+    builder.build()
+    assert log.read() == "{}\nlink\n".format(src.join("b.pro"))
+
+
+def test_watcher(eng, tmpdir):
+    from .watch import Watcher
+    rules = tmpdir.join("rules.pro")
+    rules.write("limit(10).\n")
+    eng.reconsult(str(rules).replace("\\", "/"))
+    watcher = Watcher([str(tmpdir)], debounce=0)
+    watcher.register(eng)
+    rules.write("limit(200).\n")
+    assert watcher.poll() == [str(rules)]
+    assert watcher.poll() == []
+    assert eng.query_one("limit(X)") == {"X": 200}
+    assert watcher.stats()["reloads"] == 1
+
+
+def test_snapshot(eng, tmpdir):
+    try:
+        locate_file("acmp.exe")
+    except FileNotFoundError:
+        with pytest.raises(AmziError):
+            eng.save_snapshot(str(tmpdir.join("state.json")))
+        pytest.skip("acmp.exe is not available")
+    eng.reconsult_str("""
+    parent(a, b).
+    grandparent(X, Z):- parent(X, Y), parent(Y, Z).
+    """)
+    eng.assertz("parent(b, c)")
+    filename = str(tmpdir.join("state.json"))
+    info = eng.save_snapshot(filename)
+    assert info["compiled"] == "state.plm"
+    eng2 = Engine.from_snapshot(filename)
+    try:
+        assert eng2.query_one("grandparent(a, Z)") == {"Z": "c"}
+        eng2.assertz("parent(c, d)")
+        assert eng2.query_one("grandparent(b, Z)") == {"Z": "d"}
+    finally:
+        eng2.close()
+    tmpdir.join("state.plm").write("corrupt")
+    with pytest.raises(AmziError):
+        Engine.from_snapshot(filename)
+
+
 def test_query(eng):
     test_code = """
     parent(a, b).
@@ -161,3 +593,112 @@ def test_query(eng):
     assert eng.query_one("parent(b, X)") is None
     assert list(eng.query_all("parent(X, Y)")) == [{"X":"a", "Y":"b"}, {"X":"a", "Y":"c"}]
     assert list(eng.query_all("parent(b, X)")) == []
+
+
+def test_prepared_query(eng):
+    test_code = """
+    parent(a, b).
+    parent(a, c).
+    """
+    eng.reconsult_str(test_code)
+    query = eng.prepare("parent({p}, X)")
+    assert query.params == ["p"]
+    assert query.variables == ["X"]
+    assert query.query_one(p="a") == {"X":"b"}
+    assert query.query_one(p="b") is None
+    assert list(query.query_all(p="a")) == [{"X":"b"}, {"X":"c"}]
+    assert eng.prepare("parent({p}, X)") is query
+    assert eng.query_one("parent({p}, X)", p="a") == {"X":"b"}
+    with pytest.raises(KeyError):
+        query.query_one()
+    eng._auto_prepared.maxsize = 1
+    for template in ("parent({p}, X)", "parent(X, {c})", "parent({p}, {c})"):
+        eng.query_one(template, p="a", c="c")
+    assert eng._auto_prepared.evictions == 1
+    assert query.query_one(p="a") == {"X":"b"}
+    query.close()
+    with pytest.raises(AmziError):
+        query.query_one(p="a")
+    assert eng.prepare("parent({p}, X)").query_one(p="a") == {"X":"b"}
+
+
+def test_engine_pool():
+    import threading
+    from .pool import EnginePool
+    program = """
+    parent(a, b).
+    parent(a, c).
+    """
+    with EnginePool(2, name=str(uuid.uuid1()), program=program) as pool:
+        results = []
+        def worker():
+            for _ in range(5):
+                with pool.engine() as eng:
+                    results.append(eng.query_one("parent(X, Y)"))
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [{"X":"a", "Y":"b"}] * 20
+
+        with pool.engine() as eng:
+            eng.call_str("parent(X, Y)")
+            error = []
+            def other():
+                try:
+                    eng.exec_str("parent(X, Y)")
+                except Exception as e:
+                    error.append(e)
+            t = threading.Thread(target=other)
+            t.start()
+            t.join()
+            assert len(error) == 1
+        assert eng._call_stack == []
+
+        stats = pool.stats()
+        assert stats["size"] == 2
+        assert stats["available"] == 2
+        assert stats["checkouts"] == 21
+
+
+def test_async_engine():
+    import asyncio
+    from .aio import AsyncEngine
+
+    async def run():
+        async with AsyncEngine(queue_size=1) as eng:
+            await eng.reconsult_str("""
+            parent(a, b).
+            parent(a, c).
+            """)
+            assert await eng.query_one("parent(X, Y)") == {"X":"a", "Y":"b"}
+            assert len(await eng.find_all("parent(X, Y)")) == 2
+            res = [item async for item in eng.query_all("parent(X, Y)")]
+            assert res == [{"X":"a", "Y":"b"}, {"X":"a", "Y":"c"}]
+            res = []
+            async for item in eng.query_all("parent(a, Y)"):
+                res.append(await asyncio.wait_for(eng.query_one("parent(X, {})".format(item["Y"])), 5))
+            assert res == [{"X":"a"}, {"X":"a"}]
+        eng = await AsyncEngine.create()
+        assert await eng.query_one("X = 1") == {"X": 1}
+        await eng.close()
+
+    asyncio.run(run())
+
+
+def test_parallel_engine():
+    from .parallel import ParallelEngine
+    program = """
+    parent(a, b).
+    parent(a, c).
+    parent(b, d).
+    """
+    with ParallelEngine(2, program=program) as peng:
+        goals = ["parent(a, X)", "parent(b, X)", "parent(c, X)"]
+        assert peng.map(goals) == [[Struct("parent", ("a", "b")), Struct("parent", ("a", "c"))],
+                                   [Struct("parent", ("b", "d"))],
+                                   []]
+        assert sorted(i for i, _ in peng.imap_unordered(goals)) == [0, 1, 2]
+        res = list(peng.partition("parent(P, X)", "P", ["a", "b", "c"]))
+        assert res == [{"P":"a", "X":"b"}, {"P":"a", "X":"c"}, {"P":"b", "X":"d"}]
@@ -1,4 +1,8 @@
+import hashlib
+import os
+import re
 from collections import defaultdict
+from functools import lru_cache
 from os import path
 from glob import glob
 
@@ -24,7 +28,95 @@ def split_clauses(program):
     yield program[pos:]
 
 
-def find_files(fn):
-    folder = path.dirname(path.abspath(__file__))
+_QUERY_TOKEN = re.compile(r"""
+    (?P<quoted>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`(?:[^`\\]|\\.)*`|0'(?:\\.|.))
+  | \{\s*(?P<param>[a-z]\w*)\s*\}
+  | (?P<number>\d\w*)
+  | (?P<name>[A-Za-z_]\w*)
+""", re.VERBOSE)
+
+
+def parse_query_template(template, param_format="PYAMZI_{}"):
+    params = []
+    variables = []
+
+    def replace(match):
+        param = match.group("param")
+        if param is not None:
+            if param not in params:
+                params.append(param)
+            return param_format.format(param)
+        name = match.group("name")
+        if name is not None and name != "_" and (name[0].isupper() or name[0] == "_"):
+            if name not in variables:
+                variables.append(name)
+        return match.group(0)
+
+    goal = _QUERY_TOKEN.sub(replace, template)
+    return goal, params, variables
+
+
+_SPACE_AROUND = re.compile(r"\s*([,()\[\]|])\s*")
+_SPACE = re.compile(r"\s+")
+
+
+def _squeeze(text):
+    return _SPACE.sub(" ", _SPACE_AROUND.sub(r"\1", text))
+
+
+def normalize_query(query):
+    text = []
+    names = set()
+    pos = 0
+    for match in _QUERY_TOKEN.finditer(query):
+        name = match.group("name")
+        if name is not None and name[0].islower():
+            names.add(name)
+        elif match.group("quoted") is not None:
+            text.append(_squeeze(query[pos:match.start()]))
+            text.append(match.group(0))
+            pos = match.end()
+    text.append(_squeeze(query[pos:]))
+    return "".join(text).strip(), frozenset(names)
+
+
+def file_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_files(fn, folder=None):
+    if folder is None:
+        folder = path.dirname(path.abspath(__file__))
     return glob(path.join(folder, "**/{}".format(fn)), recursive=True)
 
+
+RESOURCE_ENV = {
+    "amzi.dll": "PYAMZI_LIB",
+    "init.xpl": "PYAMZI_INIT",
+    "acmp.exe": "PYAMZI_ACMP",
+    "alnk.exe": "PYAMZI_ALNK",
+}
+
+RESOURCE_DIRS = ["", "prolog/init", "apls/bin", "apls/lib"]
+
+
+@lru_cache(maxsize=None)
+def locate_file(fn):
+    env = RESOURCE_ENV.get(fn)
+    if env is not None and os.environ.get(env):
+        return os.environ[env]
+    folder = os.environ.get("PYAMZI_HOME") or path.dirname(path.abspath(__file__))
+    for sub_folder in RESOURCE_DIRS:
+        filename = path.join(folder, sub_folder, fn)
+        if path.exists(filename):
+            return filename
+    files = find_files(fn, folder)
+    if not files:
+        raise FileNotFoundError("Can't find {} in {}, set {} to its path".format(
+            fn, folder, env or "PYAMZI_HOME"))
+    return files[0]
+
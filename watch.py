@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from collections import deque
+from glob import glob
+from os import path
+
+
+class Watcher:
+    def __init__(self, paths=(), builder=None, interval=0.5, debounce=0.2, rebuild=False):
+        self.paths = [path.abspath(p) for p in paths]
+        self.builder = builder
+        self.interval = interval
+        self.debounce = debounce
+        self.rebuild = rebuild
+        self.reloads = 0
+        self.latencies = deque(maxlen=1000)
+        self._targets = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stamps = self._scan()
+
+    def files(self):
+        files = []
+        if self.builder is not None:
+            files.extend(self.builder.find("*.pro"))
+        for p in self.paths:
+            if path.isdir(p):
+                files.extend(glob(path.join(p, "*.pro")))
+            else:
+                files.append(p)
+        return files
+
+    def _scan(self):
+        stamps = {}
+        for filename in self.files():
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            stamps[filename] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def register(self, target):
+        with self._lock:
+            self._targets.append(target)
+
+    def unregister(self, target):
+        with self._lock:
+            self._targets.remove(target)
+
+    def _engines(self):
+        with self._lock:
+            targets = list(self._targets)
+        for target in targets:
+            if hasattr(target, "engines"):
+                yield from target.engines
+            else:
+                yield target
+
+    def poll(self):
+        now = time.perf_counter()
+        stamps = self._scan()
+        for filename, stamp in stamps.items():
+            if self._stamps.get(filename) != stamp:
+                first = self._pending.get(filename, (now, now))[0]
+                self._pending[filename] = (first, now)
+        self._stamps = stamps
+        ready = [filename for filename, (_, last) in self._pending.items() if now - last >= self.debounce]
+        if ready:
+            self.reload({filename: self._pending.pop(filename)[0] for filename in ready})
+        return ready
+
+    def reload(self, files):
+        if self.rebuild and self.builder is not None:
+            self.builder.build()
+        for eng in self._engines():
+            for filename, detected in files.items():
+                eng.schedule_reload(filename.replace("\\", "/"), detected, self._reloaded)
+
+    def _reloaded(self, eng, filename, latency):
+        with self._lock:
+            self.reloads += 1
+            self.latencies.append(latency)
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self.latencies)
+        return {
+            "reloads": self.reloads,
+            "pending": len(self._pending),
+            "mean_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "max_latency": max(latencies, default=0.0),
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="pyamzi-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()